@@ -1,20 +1,28 @@
-import threading
-import time
 import tkinter.simpledialog as simpledialog
 import tkinter as tk
 from tkinter import messagebox
 
-from gui import DemandDialog, SuitChangeDialog
-from game import Player, MakaoGame, MainPlayer
+from events import EventLog, VERBOSE, console_sink
+from gui import CardImageCache, DemandDialog, SuitChangeDialog, TurnWorker
+from game import DEMAND, MAX_DECKS, PENALTY_DRAW, REVERSE, SUIT_CHANGE, WAIT, MakaoGame, MainPlayer, max_players
+
+# Zmniejszenie obrazków kart na stosie i w ręce
+TOP_CARD_SCALE = 3
+HAND_CARD_SCALE = 4
+# Przerwa między ruchami komputerów w milisekundach
+AI_DELAY = 2000
+# Panele przeciwników w jednym wierszu, przy dużych stołach w kilku wierszach
+PANELS_PER_ROW = 6
 
 
 class MakaoGUI:
-    def __init__(self, root, game):
+    def __init__(self, root, game, ai_delay=AI_DELAY):
         """
             Initialize the MakaoGUI instance.
 
             :param root: The root Tkinter window.
             :param game: The MakaoGame instance.
+            :param ai_delay: Pause in milliseconds after every computer player's move, 0 for none.
         """
 
         self.root = root
@@ -22,8 +30,11 @@ class MakaoGUI:
         self.game = game
         self.current_player = self.game.current_player
         self.main_player = self.game.players[-1]
+        self.ai_delay = ai_delay
+        self.turn_worker = TurnWorker(self.root)
 
-        self.card_images = self.load_card_images()
+        self.card_images = CardImageCache(self.root)
+        self.card_images.preload((TOP_CARD_SCALE, HAND_CARD_SCALE))
 
         window_width = 1000
         window_height = 700
@@ -50,6 +61,8 @@ class MakaoGUI:
         # Frame for main player's hand
         self.main_player_frame = tk.Frame(self.root)
         self.main_player_frame.pack(pady=20)
+        # Przyciski kart w ręce według (kod karty, numer kopii) razem z ich ostatnim układem
+        self.card_buttons = {}
 
         # Label for displaying player's information
         self.player_info_label = tk.Label(self.root, text="", font=("Arial", 12))
@@ -68,8 +81,7 @@ class MakaoGUI:
         self.show_board()
         messagebox.showinfo("Welcome to the game", "Welcome in the game Makao! Start a game")
 
-        time.sleep(1)
-        self.update_display()
+        self.root.after(self.ai_delay // 2, self.update_display)
 
     def create_player_panel(self, parent):
         """
@@ -78,20 +90,26 @@ class MakaoGUI:
             :param parent: The parent frame.
         """
         frame = tk.Frame(parent, relief=tk.RIDGE, borderwidth=2)
-        frame.pack(side="left", padx=10)
+        row, col = divmod(len(self.player_panels), PANELS_PER_ROW)
+        frame.grid(row=row, column=col, padx=10, pady=5)
         label = tk.Label(frame, text="", font=("Arial", 12))
         label.pack()
         self.player_panels.append((frame, label))
 
     def update_player_panels(self):
         """
-            Update the player panels with the current game state.
+            Update the player panels with the current game state, touching only labels whose text changed.
         """
         for idx, player in enumerate(self.game.players[:-1]):
             if idx < len(self.player_panels):
                 frame, label = self.player_panels[idx]
-                label.config(text=self.player_information(player))
-        self.player_info_label.config(text=self.player_information(self.main_player))
+                self.set_label_text(label, self.player_information(player))
+        self.set_label_text(self.player_info_label, self.player_information(self.main_player))
+
+    @staticmethod
+    def set_label_text(label, text):
+        if label.cget("text") != text:
+            label.config(text=text)
 
     def player_information(self, player):
         player_info = f"Name: {player.name}\n"
@@ -104,10 +122,10 @@ class MakaoGUI:
             player_info += f"Has drawn card(s)\n"
         if player.is_waiting:
             player_info += f"Blocked\n"
-        if Player.demand:
-            player_info += f"Demanding: {Player.demand}\n"
-        if Player.change_of_suit:
-            player_info += f"Changed suit to: {Player.change_of_suit}\n"
+        if self.game.table.demand:
+            player_info += f"Demanding: {self.game.table.demand}\n"
+        if self.game.table.change_of_suit:
+            player_info += f"Changed suit to: {self.game.table.change_of_suit}\n"
         if player == self.main_player and self.main_player.my_turn:
             player_info = "Your turn!\n" + player_info
         return player_info
@@ -118,15 +136,13 @@ class MakaoGUI:
         """
         self.show_board()
         self.current_player = self.game.current_player
-        current_card = self.game.discard_pile[-1]
+        current_card = self.game.top_card()
 
-        card_image = self.get_card_image(current_card)
+        card_image = self.get_card_image(current_card, TOP_CARD_SCALE)
 
         if card_image:
             self.current_card_label.config(text=f"Current card: {current_card}", font=("Arial", 12))
-            resized_image = card_image.subsample(3)
-            self.current_card_label.config(image=resized_image, compound="top", padx=10, pady=10)
-            self.current_card_label.image = resized_image
+            self.current_card_label.config(image=card_image, compound="top", padx=10, pady=10)
         else:
             self.current_card_label.config(text=f"Current card: {current_card}")
 
@@ -143,81 +159,101 @@ class MakaoGUI:
                 self.show_board()
                 self.current_player.played_card = True
         else:
-            threading.Thread(target=self.wait_for_players_move).start()
+            self.turn_worker.submit(self.game.play_turn, self.finish_players_move)
 
     def show_board(self):
         """
         Update the game board display with the current state of the main player's hand.
+        Every card keeps its button between redraws; only buttons of added or removed cards are created
+        or destroyed and only buttons whose position or state changed are reconfigured.
         """
-        for widget in self.main_player_frame.winfo_children():
-            widget.destroy()
-
         main_player = self.game.players[-1]
-        current_card = self.game.discard_pile[-1]
+        current_card = self.game.top_card()
 
         max_cards_per_row = 10  # Maksymalna liczba kart w jednym wierszu
-        row = 0
-        col = 0
+        playable = main_player.playable_mask(current_card)
 
-        for idx, card in enumerate(main_player.hand):
-            if col >= max_cards_per_row:
-                row += 1
-                col = 0
-            if main_player.my_turn:
-                if main_player.can_play:
-                    if card in main_player.show_playable_cards(current_card):
-                        btn = tk.Button(self.main_player_frame, text=str(card),
-                                        command=lambda c=card: self.play_card(c))
-                    else:
-                        btn = tk.Button(self.main_player_frame, text=str(card), state="disabled")
-                    if current_card.rank != '4':
-                        self.draw_button.config(state='normal')
-                    else:
-                        self.draw_button.config(state='disabled')
+        if main_player.my_turn:
+            if main_player.can_play:
+                if self.game.table.rules.effect[current_card.code] != WAIT:
+                    self.draw_button.config(state='normal')
                 else:
-                    btn = tk.Button(self.main_player_frame, text=str(card), state="active")
-                    if main_player.is_waiting or main_player.has_drawn:
-                        self.draw_button.config(state='disabled')
-                        self.end_turn_button.config(state='normal')
-                    else:
-                        self.draw_button.config(state='normal')
-                        self.end_turn_button.config(state='disabled')
+                    self.draw_button.config(state='disabled')
+            elif main_player.is_waiting or main_player.has_drawn:
+                self.draw_button.config(state='disabled')
+                self.end_turn_button.config(state='normal')
             else:
-                btn = tk.Button(self.main_player_frame,
-                                text=str(card), state="active",
-                                bg="SystemButtonFace",
-                                highlightbackground="SystemButtonFace")
-                btn.grid(row=row, column=col, padx=5)
-
+                self.draw_button.config(state='normal')
                 self.end_turn_button.config(state='disabled')
-                self.draw_button.config(state='disabled')
+        else:
+            self.end_turn_button.config(state='disabled')
+            self.draw_button.config(state='disabled')
 
-            card_image = self.get_card_image(card)
-            if card_image:
-                resized_image = card_image.subsample(4)
-                btn.config(image=resized_image, compound="top", width=75,
-                           height=90)
-                btn.image = resized_image
-            btn.grid(row=row, column=col, padx=5)
+        copies = {}
+        shown = set()
+        for idx, card in enumerate(main_player.hand):
+            key = (card.code, copies.get(card.code, 0))
+            copies[card.code] = key[1] + 1
+            shown.add(key)
+            if not main_player.my_turn:
+                view = "idle"
+            elif not main_player.can_play:
+                view = "active"
+            elif playable >> card.code & 1:
+                view = "playable"
+            else:
+                view = "disabled"
+            row, col = divmod(idx, max_cards_per_row)
+            layout = (row, col, view)
+
+            entry = self.card_buttons.get(key)
+            if entry is None:
+                btn = tk.Button(self.main_player_frame, text=str(card))
+                card_image = self.get_card_image(card, HAND_CARD_SCALE)
+                if card_image:
+                    btn.config(image=card_image, compound="top", width=75,
+                               height=90)
+                entry = self.card_buttons[key] = [btn, None]
+            btn, old_layout = entry
+            if old_layout == layout:
+                continue
+            if old_layout is None or old_layout[2] != view:
+                self.configure_card_button(btn, card, view)
+            if old_layout is None or old_layout[:2] != layout[:2]:
+                btn.grid(row=row, column=col, padx=5)
+            entry[1] = layout
 
-            col += 1
+        for key in [key for key in self.card_buttons if key not in shown]:
+            self.card_buttons.pop(key)[0].destroy()
 
         self.update_player_panels()
 
+    def configure_card_button(self, btn, card, view):
+        """
+        Sets state and action of a card button
+        :param view: "playable", "disabled", "active" (main player's turn without playable cards)
+                     or "idle" (turn of another player)
+        """
+        if view == "playable":
+            btn.config(state="normal", command=lambda c=card: self.play_card(c))
+        elif view == "disabled":
+            btn.config(state="disabled", command="")
+        elif view == "active":
+            btn.config(state="active", command="")
+        else:
+            btn.config(state="active", command="", bg="SystemButtonFace", highlightbackground="SystemButtonFace")
+
     def play_game(self):
         """
         Proceeds to the next turn in the game and updates the display accordingly.
         """
-        current_player_index = self.game.players.index(self.game.current_player)
-        next_player_index = (current_player_index + 1) % len(self.game.players)
-        self.game.current_player = self.game.players[next_player_index]
+        self.game.next_player()
         self.update_display()
 
-    def wait_for_players_move(self):
+    def finish_players_move(self, result=None):
         """
-            Computer-player's move.
+            Show the computer-player's move computed by the turn worker; runs in the Tk loop.
         """
-        self.game.play_turn()
         if len(self.game.current_player.hand) == 1:
             messagebox.showinfo("Makao", f":o {self.game.current_player.name} says: MAKAO!")
         if not self.game.current_player.hand:
@@ -225,8 +261,7 @@ class MakaoGUI:
             self.root.quit()
         else:
             self.show_board()
-            time.sleep(2)
-            self.play_game()
+            self.root.after(self.ai_delay, self.play_game)
 
     def main_player_logic(self, current_card):
         """
@@ -241,50 +276,39 @@ class MakaoGUI:
         first_card = self.game.deck.first_card()
         if mplayer.waiting == 0:
             mplayer.show_hand()
+            rules = self.game.table.rules
+            effect = rules.effect[current_card.code]
             playable_cards = mplayer.show_playable_cards(current_card)
-            if ((current_card.rank == '2' or current_card.rank == '3' or
-                 (current_card.rank == 'K' and (current_card.suit == "Spades" or current_card.suit == "Hearts")))
-                    and Player.has_to_draw):
+            if effect == PENALTY_DRAW and self.game.table.has_to_draw:
                 if len(playable_cards) != 0:
                     messagebox.showinfo("Information", "Możesz się ruszyć")
                     return True
-                if current_card.rank == '2':
-                    if first_card.rank == '2' or (first_card.rank == '3' and first_card.suit == current_card.suit):
-                        messagebox.showinfo("Information", "Dobieram 1")
-                        ca = mplayer.draw(self.game.deck)[0]
-                        return True
-                if current_card.rank == '3':
-                    if first_card.rank == '3' or (first_card.rank == '2' and first_card.suit == current_card.suit):
-                        messagebox.showinfo("Information", "Dobieram 1")
-                        ca = mplayer.draw(self.game.deck)[0]
-                        return True
-                if current_card.rank == 'K':
-                    if first_card.rank == 'K' and (current_card.suit == "Spades" or current_card.suit == "Hearts"):
-                        messagebox.showinfo("Information", "Możesz się ruszyć")
-                        ca = mplayer.draw(self.game.deck)[0]
-                        return True
+                if first_card is not None and rules.penalty_peek[current_card.code] >> first_card.code & 1:
+                    messagebox.showinfo("Information", "Dobieram 1")
+                    mplayer.draw(self.game.deck)
+                    return True
                 if len(playable_cards) == 0:
-                    Player.has_to_draw = False
+                    self.game.table.has_to_draw = False
                     mplayer.played_card = False
-                    mplayer.draw(self.game.deck, Player.how_many_to_draw)
-                    messagebox.showinfo("Information", f"Dobrano {Player.how_many_to_draw}")
+                    mplayer.draw(self.game.deck, self.game.table.how_many_to_draw)
+                    messagebox.showinfo("Information", f"Dobrano {self.game.table.how_many_to_draw}")
                     mplayer.set_how_many_to_draw(0)
                     return False
-            elif current_card.rank == '4' and Player.has_to_wait:
+            elif effect == WAIT and self.game.table.has_to_wait:
                 if len(playable_cards) != 0:
                     return True
                 else:
                     messagebox.showinfo("Information", "Jesteś zablokowany")
-                    Player.has_to_wait = False
+                    self.game.table.has_to_wait = False
                     mplayer.played_card = False
                     mplayer.is_waiting = True
                     return False
-            elif Player.demand is not None:
-                Player.drawn_countJ += 1
-                if Player.drawn_countJ > Player.id - 1:
-                    Player.drawn_countJ = 0
-                    Player.demand = None
-                    Player.has_to_draw = False
+            elif self.game.table.demand is not None:
+                self.game.table.drawn_countJ += 1
+                if self.game.table.drawn_countJ > self.game.table.players_count:
+                    self.game.table.drawn_countJ = 0
+                    self.game.table.demand = None
+                    self.game.table.has_to_draw = False
 
                 if len(playable_cards) != 0:
                     return True
@@ -296,9 +320,9 @@ class MakaoGUI:
                 return True
             else:
                 card = self.game.deck.first_card()
-                if card.rank == current_card.rank or card.suit == current_card.suit:
+                if card is not None and (card.rank == current_card.rank or card.suit == current_card.suit):
                     messagebox.showinfo("Information", "Możesz się ruszyć")
-                    ca = mplayer.draw(self.game.deck)[0]
+                    mplayer.draw(self.game.deck)
                     return True
                 else:
                     mplayer.played_card = False
@@ -314,12 +338,12 @@ class MakaoGUI:
         :param card: The card to be played by the main player.
         """
         main_player = self.game.players[-1]
-        current_card = self.game.discard_pile[-1]
+        current_card = self.game.top_card()
         played_card = main_player.play_card([card])
         if played_card:
-            if card.rank != 'A' and Player.change_of_suit is not None:
-                Player.change_of_suit = None
-            self.game.discard_pile.append(played_card)
+            if self.game.table.rules.effect[card.code] != SUIT_CHANGE and self.game.table.change_of_suit is not None:
+                self.game.table.change_of_suit = None
+            self.game.deck.discard(played_card)
             main_player.last_card_played = played_card
             messagebox.showinfo("Played", f"Played {played_card}")
             self.show_board()
@@ -341,22 +365,24 @@ class MakaoGUI:
         Handles special actions triggered by playing certain cards.
         :param card: The card played by the main player.
         """
-        if card.rank == 'J':
-            dialog = DemandDialog(self.root)
+        rules = self.game.table.rules
+        effect = rules.effect[card.code]
+        if effect == DEMAND:
+            dialog = DemandDialog(self.root, self.game.table)
             self.root.wait_window(dialog)
-            if Player.demand:
-                Player.drawn_countJ = 0
-                Player.has_to_draw = True
-        elif card.rank == '2' or card.rank == '3' or (
-                card.rank == 'K' and (card.suit == "Hearts" or card.suit == "Spades")):
-            Player.has_to_draw = True
-            to_add = 5 if card.rank == 'K' else int(card.rank)
-            self.game.players[-1].set_how_many_to_draw(to_add)
-        elif card.rank == 'A':
-            dialog = SuitChangeDialog(self.root)
+            if self.game.table.demand:
+                self.game.table.drawn_countJ = 0
+                self.game.table.has_to_draw = True
+        elif effect == PENALTY_DRAW:
+            self.game.table.has_to_draw = True
+            self.game.players[-1].set_how_many_to_draw(rules.penalty[card.code])
+        elif effect == SUIT_CHANGE:
+            dialog = SuitChangeDialog(self.root, self.game.table)
             self.root.wait_window(dialog)
-        elif card.rank == '4':
-            Player.has_to_wait = True
+        elif effect == WAIT:
+            self.game.table.has_to_wait = True
+        elif effect == REVERSE:
+            self.game.reverse_direction()
 
     def end_turn(self):
         """
@@ -385,36 +411,15 @@ class MakaoGUI:
         main_player.my_turn = False
         main_player.has_drawn = True
 
-    def load_card_images(self):
-        """
-            Load card images from the filesystem.
-
-            :return: A dictionary mapping card names to Tkinter PhotoImage objects.
-        """
-        suits = {'Spades': 'p', 'Diamonds': 'd', 'Hearts': 's', 'Clubs': 't'}
-        ranks = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'j', 'q', 'k', 'a']
-        card_images = {}
-        for suit in suits.values():
-            for rank in ranks:
-                card_name = f"{suit}{rank}"
-                image_path = f"cards/{card_name}.png"
-                try:
-                    image = tk.PhotoImage(file=image_path)
-                    card_images[card_name] = image
-                except Exception as e:
-                    print(f"Error loading image {image_path}: {e}")
-        return card_images
-
-    def get_card_image(self, card):
+    def get_card_image(self, card, scale=1):
         """
             Get the image for a given card.
 
             :param card: The card object.
-            :return: The PhotoImage object for the card.
+            :param scale: Subsample factor of the image.
+            :return: The PhotoImage object for the card, shared by all redraws.
         """
-        suit_map = {'Spades': 'p', 'Diamonds': 'd', 'Hearts': 's', 'Clubs': 't'}
-        card_name = f"{suit_map[card.suit]}{card.rank.lower()}"
-        return self.card_images.get(card_name)
+        return self.card_images.get(card, scale)
 
 
 def show_instructions(root):
@@ -439,9 +444,13 @@ def start_game():
     show_instructions(root)
     root.destroy()
 
+    decks = simpledialog.askinteger("Number of Decks", f"Enter number of decks (1-{MAX_DECKS}):", minvalue=1,
+                                    maxvalue=MAX_DECKS, initialvalue=1) or 1
+    max_opponents = max_players(decks) - 1
+    num_players = simpledialog.askinteger("Number of Players", f"Enter number of players (1-{max_opponents}):",
+                                          minvalue=1, maxvalue=max_opponents) or min(3, max_opponents)
     player_names = ["Jess", "Nick", "Daniel"]
-
-    num_players = simpledialog.askinteger("Number of Players", "Enter number of players (1-3):", minvalue=1, maxvalue=3)
+    player_names += [f"Computer {idx + 1}" for idx in range(len(player_names), num_players)]
 
     main_player_name = ""
     while not main_player_name:
@@ -449,11 +458,12 @@ def start_game():
         if not main_player_name:
             messagebox.showwarning("Input Required", "You must enter your name to proceed.")
 
-    game = MakaoGame(player_names[:num_players], main_player_name)
+    game = MakaoGame(player_names[:num_players], main_player_name, EventLog(VERBOSE, [console_sink]), decks=decks)
     game.prepare_game()
     root = tk.Tk()
     gui = MakaoGUI(root, game)
     root.mainloop()
+    gui.turn_worker.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,182 @@
+import json
+from collections import defaultdict
+
+from game import CARDS, RANKS, STANDARD_RULES
+
+CARD_BY_NAME = {card.name: card for card in CARDS}
+
+
+class GameStats:
+    """
+    Online statistics of any number of games, fed with their events: wins by seat and table size, the
+    distribution of game lengths, plays of functional cards, depth of penalty stacks and reshuffles.
+
+    Memory does not grow with the number of games: every statistic is a histogram or a counter over a bounded
+    domain. Statistics gathered separately, e.g. in worker processes, are combined with snapshot and merge.
+    """
+
+    def __init__(self, rules=None):
+        """
+        :param rules: RuleSet of the games, deciding which cards are functional and penalty cards;
+                      STANDARD_RULES by default
+        """
+        self.rules = rules if rules is not None else STANDARD_RULES
+        # Rangi funkcyjne w kolejności talii, np. 2, 3, 4, J, Q, K, A
+        self.functional_order = [rank for rank in RANKS if rank in self.rules.functional_ranks]
+        self.games = defaultdict(int)
+        self.unfinished = defaultdict(int)
+        # Liczba wygranych według wielkości stołu i numeru miejsca
+        self.wins = defaultdict(int)
+        # Histogram długości gier w turach, indeks to liczba tur
+        self.lengths = []
+        self.turns = 0
+        self.cards_played = 0
+        self.functional = defaultdict(int)
+        # Liczba kart karnych ułożonych na sobie, zanim ktoś dobrał karę, i liczba dobranych kart
+        self.penalty_depth = defaultdict(int)
+        self.penalty_cards = defaultdict(int)
+        # Histogram liczby przetasowań w jednej grze
+        self.reshuffles = defaultdict(int)
+
+    def sink(self):
+        """
+        Creates an EventLog sink for one game; it follows the game and adds it to these statistics on its
+        "game_over" event
+        """
+        return _GameTracker(self)
+
+    def add_game(self, players, winner, turns, reshuffles):
+        """
+        :param players: Table size
+        :param winner: Winner seat or None for an abandoned game
+        :param turns: Number of turns played
+        :param reshuffles: Number of times the discard pile was turned into a new deck
+        """
+        self.games[players] += 1
+        if winner is None:
+            self.unfinished[players] += 1
+        else:
+            self.wins[players, winner] += 1
+        if turns >= len(self.lengths):
+            self.lengths.extend([0] * (turns + 1 - len(self.lengths)))
+        self.lengths[turns] += 1
+        self.turns += turns
+        self.reshuffles[reshuffles] += 1
+
+    def length_quantile(self, fraction):
+        """
+        :return: Smallest game length such that at least fraction of games are not longer
+        """
+        target = fraction * sum(self.lengths)
+        seen = 0
+        for turns, count in enumerate(self.lengths):
+            seen += count
+            if count and seen >= target:
+                return turns
+        return 0
+
+    def snapshot(self):
+        """
+        :return: Plain dictionary of all statistics, e.g. to send from a worker process or write as JSON
+        """
+        return {
+            "games": {str(size): count for size, count in sorted(self.games.items())},
+            "unfinished": {str(size): count for size, count in sorted(self.unfinished.items())},
+            "wins": {str(size): [self.wins[size, seat] for seat in range(size)] for size in sorted(self.games)},
+            "lengths": {str(turns): count for turns, count in enumerate(self.lengths) if count},
+            "turns": self.turns,
+            "cards_played": self.cards_played,
+            "functional": {rank: self.functional[rank] for rank in self.functional_order},
+            "penalty_depth": {str(depth): count for depth, count in sorted(self.penalty_depth.items())},
+            "penalty_cards": {str(cards): count for cards, count in sorted(self.penalty_cards.items())},
+            "reshuffles": {str(reshuffles): count for reshuffles, count in sorted(self.reshuffles.items())},
+        }
+
+    def merge(self, snapshot):
+        """
+        Adds statistics from a snapshot, e.g. one taken in a worker process
+        """
+        for size, count in snapshot["games"].items():
+            self.games[int(size)] += count
+        for size, count in snapshot["unfinished"].items():
+            self.unfinished[int(size)] += count
+        for size, wins in snapshot["wins"].items():
+            for seat, count in enumerate(wins):
+                self.wins[int(size), seat] += count
+        for turns, count in snapshot["lengths"].items():
+            turns = int(turns)
+            if turns >= len(self.lengths):
+                self.lengths.extend([0] * (turns + 1 - len(self.lengths)))
+            self.lengths[turns] += count
+        self.turns += snapshot["turns"]
+        self.cards_played += snapshot["cards_played"]
+        for rank, count in snapshot["functional"].items():
+            self.functional[rank] += count
+        for name in ("penalty_depth", "penalty_cards", "reshuffles"):
+            histogram = getattr(self, name)
+            for value, count in snapshot[name].items():
+                histogram[int(value)] += count
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def report(self):
+        games = sum(self.games.values())
+        if not games:
+            return "No games"
+        lines = [f"Games: {games}, unfinished: {sum(self.unfinished.values())}"]
+        for size in sorted(self.games):
+            rates = ", ".join(f"{self.wins[size, seat] / self.games[size]:.3f}" for seat in range(size))
+            lines.append(f"{size} players ({self.games[size]} games), win rate by seat: {rates}")
+        lines.append(f"Game length: mean {self.turns / games:.1f}, median {self.length_quantile(0.5)}, "
+                     f"90% {self.length_quantile(0.9)}, 99% {self.length_quantile(0.99)}, "
+                     f"max {len(self.lengths) - 1}")
+        per_game = ", ".join(f"{rank} {self.functional[rank] / games:.2f}" for rank in self.functional_order)
+        lines.append(f"Functional cards per game: {per_game}; "
+                     f"share of all plays {sum(self.functional.values()) / max(self.cards_played, 1):.3f}")
+        stacks = sum(self.penalty_depth.values())
+        depths = ", ".join(f"{depth}: {count / stacks:.3f}" for depth, count in sorted(self.penalty_depth.items()))
+        lines.append(f"Penalty stacks per game: {stacks / games:.2f}, depth: {depths}")
+        reshuffles = sum(value * count for value, count in self.reshuffles.items())
+        lines.append(f"Reshuffles per game: {reshuffles / games:.3f}, per 1000 turns: "
+                     f"{1000 * reshuffles / max(self.turns, 1):.2f}, "
+                     f"games with a reshuffle: {1 - self.reshuffles[0] / games:.3f}")
+        return "\n".join(lines)
+
+
+class _GameTracker:
+    """
+    State of one game between its events, kept only until the game is over
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+        self.players = 0
+        self.depth = 0
+        self.reshuffles = 0
+
+    def __call__(self, event):
+        kind = event["event"]
+        stats = self.stats
+        if kind == "turn":
+            played = event["played"]
+            stats.cards_played += len(played)
+            rules = stats.rules
+            for name in played:
+                card = CARD_BY_NAME[name]
+                if rules.functional[card.code]:
+                    stats.functional[card.rank] += 1
+                if rules.penalty[card.code]:
+                    self.depth += 1
+        elif kind == "penalty_draw":
+            stats.penalty_depth[self.depth] += 1
+            stats.penalty_cards[event["cards"]] += 1
+            self.depth = 0
+        elif kind == "reshuffle":
+            self.reshuffles += 1
+        elif kind == "game_start":
+            self.players = len(event["players"])
+            self.depth = 0
+            self.reshuffles = 0
+        elif kind == "game_over":
+            stats.add_game(self.players, event["winner"], event["turns"], self.reshuffles)
@@ -0,0 +1,287 @@
+import argparse
+import time
+
+import numpy as np
+
+from game import (DECK_SIZE, HAND_SIZE, RANKS, SUITS, STANDARD_RULES, RANK_OF, SUIT_OF, RANK_SORT_KEY,
+                  FOUR, JACK, ACE)
+
+NO_DEMAND = len(RANKS)
+NO_SUIT = len(SUITS)
+
+RANK_OF_NP = np.frombuffer(RANK_OF, dtype=np.uint8).astype(np.int64)
+SUIT_OF_NP = np.frombuffer(SUIT_OF, dtype=np.uint8).astype(np.int64)
+# BatchGame gra według zasad standardowych
+FUNCTIONAL_NP = np.frombuffer(STANDARD_RULES.functional, dtype=np.uint8).astype(bool)
+PENALTY_NP = np.frombuffer(STANDARD_RULES.penalty, dtype=np.uint8).astype(np.int64)
+# Kolejność kart w posortowanej ręce gracza komputerowego (ranga jak przy sortowaniu napisów, potem kolor)
+HAND_ORDER = np.frombuffer(RANK_SORT_KEY, dtype=np.uint8).astype(np.int64) * len(SUITS) + SUIT_OF_NP
+# Kolejność rang przy wyborze żądania waletem i przy remisie liczności rang
+RANK_ORDER = np.array([sorted(RANKS).index(rank) for rank in RANKS], dtype=np.int64)
+NON_FUNCTIONAL_RANKS = np.array([rank not in STANDARD_RULES.functional_ranks for rank in RANKS])
+
+_BITS = np.arange(DECK_SIZE, dtype=np.uint64)
+# Wiersz LEGAL[k] odpowiada masce STANDARD_RULES.legal_moves[k], rozpisanej na 52 wartości logiczne
+LEGAL = (np.array(STANDARD_RULES.legal_moves, dtype=np.uint64)[:, None] >> _BITS & np.uint64(1)).astype(bool)
+
+# Karty, które leżąc na wierzchu talii pozwalają graczowi z karą dobrać jedną kartę i zagrać ją zamiast kary;
+# wiersz karty bez kary nie jest używany
+PEEK = (np.array(STANDARD_RULES.penalty_peek, dtype=np.uint64)[:, None] >> _BITS & np.uint64(1)).astype(bool)
+
+
+class BatchGame:
+    """
+    Many games between computer players held as arrays and advanced in lockstep, one turn of every game per step.
+
+    Rules and the computer heuristic follow Player.show_playable_cards, Player.play_card and Player.logic.
+    Differences from MakaoGame: the discard pile is recycled as soon as the deck cannot cover a pending draw
+    rather than in the middle of drawing, and cards of equal rank are ordered by suit where Player uses the order
+    in which they were drawn.
+    """
+
+    def __init__(self, games, players, seed=None):
+        """
+        Shuffles decks, deals HAND_SIZE cards to every player and turns up the first non-functional card
+        :param games: Number of games
+        :param players: Number of players at every table
+        :param seed: Seed of the NumPy random generator
+        """
+        self.games = games
+        self.players = players
+        self.rng = np.random.default_rng(seed)
+        self.hands = np.zeros((games, players, DECK_SIZE), dtype=np.uint8)
+        self.deck = np.argsort(self.rng.random((games, DECK_SIZE)), axis=1).astype(np.uint8)
+        self.deck_size = np.full(games, DECK_SIZE, dtype=np.int64)
+        self.discard = np.zeros((games, DECK_SIZE), dtype=np.uint8)
+        self.discard_size = np.zeros(games, dtype=np.int64)
+        self.has_to_draw = np.zeros(games, dtype=bool)
+        self.has_to_wait = np.zeros(games, dtype=bool)
+        self.how_many_to_draw = np.zeros(games, dtype=np.int64)
+        self.demand = np.full(games, NO_DEMAND, dtype=np.int64)
+        self.change_of_suit = np.full(games, NO_SUIT, dtype=np.int64)
+        self.drawn_countJ = np.zeros(games, dtype=np.int64)
+        self.current = np.zeros(games, dtype=np.int64)
+        self.finished = np.zeros(games, dtype=bool)
+        self.winner = np.full(games, -1, dtype=np.int64)
+        self.turns = np.zeros(games, dtype=np.int64)
+        self._prepare()
+
+    def _prepare(self):
+        every = np.arange(self.games)
+        for _ in range(HAND_SIZE):
+            for player in range(self.players):
+                self._draw(every, np.full(self.games, player), np.ones(self.games, dtype=np.int64))
+        # Karta funkcyjna wraca do talii, która jest tasowana, dopóki na wierzchu nie leży zwykła karta
+        redo = every[FUNCTIONAL_NP[self.deck[every, self.deck_size - 1]]]
+        while redo.size:
+            self._shuffle_deck(redo)
+            redo = redo[FUNCTIONAL_NP[self.deck[redo, self.deck_size[redo] - 1]]]
+        top = self.deck[every, self.deck_size - 1]
+        self.deck_size -= 1
+        self._push_discard(every, top)
+
+    def _shuffle_deck(self, g):
+        keys = self.rng.random((g.size, DECK_SIZE))
+        keys[np.arange(DECK_SIZE) >= self.deck_size[g][:, None]] = 2.0
+        order = np.argsort(keys, axis=1)
+        self.deck[g] = np.take_along_axis(self.deck[g], order, axis=1)
+
+    def _draw(self, g, p, counts):
+        """
+        Moves cards from the top of the deck to players' hands
+        :param g: Game indices
+        :param p: Player drawing in every game
+        :param counts: Number of cards to draw in every game
+        :return: Number of cards actually drawn
+        """
+        drawn = np.zeros(g.size, dtype=np.int64)
+        for k in range(int(counts.max(initial=0))):
+            active = (counts > k) & (self.deck_size[g] > 0)
+            if not active.any():
+                break
+            ga, pa = g[active], p[active]
+            self.deck_size[ga] -= 1
+            self.hands[ga, pa, self.deck[ga, self.deck_size[ga]]] += 1
+            drawn[active] += 1
+        return drawn
+
+    def _push_discard(self, g, cards):
+        self.discard[g, self.discard_size[g]] = cards
+        self.discard_size[g] += 1
+
+    def _recycle(self, g):
+        """
+        Puts the discard pile without its top card back into the deck and shuffles the deck
+        """
+        if not g.size:
+            return
+        top = self.discard[g, self.discard_size[g] - 1]
+        pool = np.concatenate([self.deck[g], self.discard[g]], axis=1)
+        columns = np.arange(DECK_SIZE)
+        valid = np.concatenate([columns < self.deck_size[g][:, None],
+                                columns < self.discard_size[g][:, None] - 1], axis=1)
+        keys = np.where(valid, self.rng.random(pool.shape), 2.0)
+        order = np.argsort(keys, axis=1)[:, :DECK_SIZE]
+        self.deck[g] = np.take_along_axis(pool, order, axis=1)
+        self.deck_size[g] += self.discard_size[g] - 1
+        self.discard[g, 0] = top
+        self.discard_size[g] = 1
+
+    def _apply_effects(self, g, card, last_in_hand):
+        """
+        Sets pending effects of played cards, like Player.play_card
+        :param g: Game indices
+        :param card: Card played in every game (the last one if several were played)
+        :param last_in_hand: Suit of the card the player would name after an ace
+        """
+        rank = RANK_OF_NP[card]
+        penalty = PENALTY_NP[card]
+        hand = self.hands[g, self.current[g]]
+
+        jack = rank == JACK
+        if jack.any():
+            gj = g[jack]
+            counts = hand[jack].reshape(-1, len(SUITS), len(RANKS)).sum(axis=1)
+            candidates = (counts > 0) & NON_FUNCTIONAL_RANKS
+            has_candidate = candidates.any(axis=1)
+            demand = np.where(candidates, RANK_ORDER, len(RANKS)).argmin(axis=1)
+            gj, demand = gj[has_candidate], demand[has_candidate]
+            self.demand[gj] = demand
+            self.drawn_countJ[gj] = 1
+            self.has_to_draw[gj] = True
+
+        gp = g[penalty > 0]
+        self.has_to_draw[gp] = True
+        self.how_many_to_draw[gp] += penalty[penalty > 0]
+
+        ace = rank == ACE
+        self.change_of_suit[g[ace]] = last_in_hand[ace]
+        self.has_to_wait[g[rank == FOUR]] = True
+
+    def _play_single(self, g, card, drawn):
+        """
+        Plays one card from every given game's current hand
+        :param drawn: True where the card has just been drawn and so lies at the end of the hand
+        """
+        hand = self.hands[g, self.current[g]]
+        last_in_hand = np.where(drawn, SUIT_OF_NP[card],
+                                SUIT_OF_NP[np.where(hand > 0, HAND_ORDER, -1).argmax(axis=1)])
+        self._apply_effects(g, card, last_in_hand)
+        self.hands[g, self.current[g], card] -= 1
+        self._push_discard(g, card)
+
+    def _play_rank(self, g, playable, rank):
+        """
+        Plays all playable cards of the chosen rank, the card with the highest suit ending on top
+        """
+        p = self.current[g]
+        codes = np.arange(len(SUITS))[None, :] * len(RANKS) + rank[:, None]
+        chosen = np.take_along_axis(playable, codes, axis=1)
+        last_suit = np.where(chosen, np.arange(len(SUITS)), -1).max(axis=1)
+        for suit in range(len(SUITS)):
+            earlier = chosen[:, suit] & (suit < last_suit)
+            self.hands[g[earlier], p[earlier], codes[earlier, suit]] -= 1
+            self._push_discard(g[earlier], codes[earlier, suit])
+        last = codes[np.arange(g.size), last_suit]
+        self._play_single(g, last, np.zeros(g.size, dtype=bool))
+
+    def step(self):
+        """
+        Plays one turn in every unfinished game
+        :return: Number of games still in progress
+        """
+        g = np.flatnonzero(~self.finished)
+        if not g.size:
+            return 0
+        self.turns[g] += 1
+        self._recycle(g[self.deck_size[g] <= self.how_many_to_draw[g] + 1])
+
+        p = self.current[g]
+        top = self.discard[g, self.discard_size[g] - 1].astype(np.int64)
+        key = (((top * 2 + self.has_to_draw[g]) * 2 + self.has_to_wait[g]) * (NO_DEMAND + 1)
+               + self.demand[g]) * (NO_SUIT + 1) + self.change_of_suit[g]
+        playable = (self.hands[g, p] > 0) & LEGAL[key]
+        can_play = playable.any(axis=1)
+        first_playable = np.where(playable, HAND_ORDER, 4 * DECK_SIZE).argmin(axis=1)
+        deck_top = self.deck[g, np.maximum(self.deck_size[g] - 1, 0)]
+        has_deck = self.deck_size[g] > 0
+
+        penalty_turn = (PENALTY_NP[top] > 0) & self.has_to_draw[g]
+        wait_turn = ~penalty_turn & (RANK_OF_NP[top] == FOUR) & self.has_to_wait[g]
+        demand_turn = ~penalty_turn & ~wait_turn & (self.demand[g] != NO_DEMAND)
+        free_turn = ~(penalty_turn | wait_turn | demand_turn)
+
+        # Cykl żądania waleta kończy się po turze każdego gracza
+        gd = g[demand_turn]
+        self.drawn_countJ[gd] += 1
+        expired = gd[self.drawn_countJ[gd] > self.players]
+        self.drawn_countJ[expired] = 0
+        self.demand[expired] = NO_DEMAND
+        self.has_to_draw[expired] = False
+
+        forced = (penalty_turn | wait_turn | demand_turn) & can_play
+        self._play_single(g[forced], first_playable[forced], np.zeros(forced.sum(), dtype=bool))
+
+        peek = penalty_turn & ~can_play & has_deck & PEEK[top, deck_top]
+        take = penalty_turn & ~can_play & ~peek
+        gt = g[take]
+        self._draw(gt, p[take], self.how_many_to_draw[gt])
+        self.has_to_draw[gt] = False
+        self.how_many_to_draw[gt] = 0
+
+        self.has_to_wait[g[wait_turn & ~can_play]] = False
+
+        draw_one = (demand_turn | free_turn) & ~can_play
+        self._draw(g[draw_one], p[draw_one], np.ones(draw_one.sum(), dtype=np.int64))
+        match = (free_turn & ~can_play & has_deck &
+                 ((RANK_OF_NP[deck_top] == RANK_OF_NP[top]) | (SUIT_OF_NP[deck_top] == SUIT_OF_NP[top])))
+        peek_or_match = peek | match
+        self._draw(g[peek], p[peek], np.ones(peek.sum(), dtype=np.int64))
+        self._play_single(g[peek_or_match], deck_top[peek_or_match], np.ones(peek_or_match.sum(), dtype=bool))
+
+        free_play = free_turn & can_play
+        gf = g[free_play]
+        counts = playable[free_play].reshape(-1, len(SUITS), len(RANKS)).sum(axis=1)
+        # Najliczniejsza ranga, przy remisie pierwsza w kolejności posortowanej ręki
+        rank = (counts * (2 * len(RANKS)) - RANK_ORDER).argmax(axis=1)
+        reset_suit = (self.change_of_suit[gf] != NO_SUIT) & (RANK_OF_NP[top[free_play]] == ACE)
+        self.change_of_suit[gf[reset_suit]] = NO_SUIT
+        self._play_rank(gf, playable[free_play], rank)
+
+        won = self.hands[g, p].sum(axis=1) == 0
+        self.finished[g[won]] = True
+        self.winner[g[won]] = p[won]
+        ongoing = g[~won]
+        self.current[ongoing] = (self.current[ongoing] + 1) % self.players
+        return ongoing.size
+
+    def run(self, max_turns=2000):
+        """
+        Plays all games until they end or reach the turn limit
+        :return: Tuple of arrays (winner seat or -1, number of turns)
+        """
+        for _ in range(max_turns):
+            if not self.step():
+                break
+        return self.winner, self.turns
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vectorized Makao simulation")
+    parser.add_argument("--games", type=int, default=10000)
+    parser.add_argument("--players", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--max-turns", type=int, default=2000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    winner, turns = BatchGame(args.games, args.players, args.seed).run(args.max_turns)
+    elapsed = time.perf_counter() - start
+    print(f"Games: {args.games}, time: {elapsed:.2f}s, games/s: {args.games / elapsed:.0f}, "
+          f"turns/s: {turns.sum() / elapsed:.0f}")
+    print(f"Wins by seat: {np.bincount(winner[winner >= 0], minlength=args.players).tolist()}, "
+          f"unfinished: {int((winner < 0).sum())}")
+
+
+if __name__ == "__main__":
+    main()
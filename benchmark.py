@@ -0,0 +1,275 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from game import CARDS, STANDARD_RULES, DECK_SIZE, CardDeck, Hand, MakaoGame, Player, TableState, SUITS
+from simulation import DEFAULT_NAMES
+
+MAX_TURNS = 2000
+
+
+class TimedPlayer(Player):
+    """
+    Computer player measuring the time spent in its own logic
+    """
+    elapsed = 0.0
+    calls = 0
+
+    def logic(self, deck, current_card):
+        start = time.perf_counter()
+        result = super().logic(deck, current_card)
+        TimedPlayer.elapsed += time.perf_counter() - start
+        TimedPlayer.calls += 1
+        return result
+
+
+def _result(ops, seconds, unit="ops", **extra):
+    result = {"ops": ops, "seconds": round(seconds, 6), "rate": ops / seconds if seconds else 0.0, "unit": unit}
+    result.update(extra)
+    return result
+
+
+def _random_positions(rng, count):
+    """
+    Builds players with random hands and random table states
+    :return: List of (player, card on top of discard pile)
+    """
+    positions = []
+    for _ in range(count):
+        codes = rng.sample(range(DECK_SIZE), rng.randint(1, 20))
+        table = TableState(rng.randint(2, 4))
+        table.has_to_draw = rng.random() < 0.3
+        table.has_to_wait = rng.random() < 0.1
+        table.demand = rng.choice([None] * 8 + ['5', '6', '7', '8', '9', '10'])
+        table.change_of_suit = rng.choice([None] * 6 + SUITS)
+        player = Player("bench", 1, table)
+        player.hand = Hand(CARDS[code] for code in codes[1:])
+        positions.append((player, CARDS[codes[0]]))
+    return positions
+
+
+def bench_show_playable_cards(rng, scale):
+    positions = _random_positions(rng, 2000)
+    rounds = 10 * scale
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for player, top in positions:
+            player.show_playable_cards(top)
+    return _result(rounds * len(positions), time.perf_counter() - start, "calls")
+
+
+def bench_draw(rng, scale):
+    decks = [CardDeck(random.Random(rng.random())) for _ in range(100 * scale)]
+    player = Player("bench")
+    start = time.perf_counter()
+    for deck in decks:
+        player.hand = Hand()
+        for _ in range(DECK_SIZE):
+            player.draw(deck)
+    return _result(len(decks) * DECK_SIZE, time.perf_counter() - start, "cards")
+
+
+def bench_play_card(rng, scale):
+    player = Player("bench")
+    orders = [rng.sample(CARDS, DECK_SIZE) for _ in range(100 * scale)]
+    elapsed = 0.0
+    for order in orders:
+        player.hand = Hand(order)
+        player.table = TableState(2)
+        start = time.perf_counter()
+        for card in order:
+            player.play_card([card])
+        elapsed += time.perf_counter() - start
+    return _result(len(orders) * DECK_SIZE, elapsed, "cards")
+
+
+def bench_recycle_discard_pile(rng, scale):
+    rounds = 500 * scale
+    elapsed = 0.0
+    deck = CardDeck(random.Random(rng.random()))
+    for _ in range(rounds):
+        codes = rng.sample(range(DECK_SIZE), DECK_SIZE)
+        deck.arrange(codes[5:45], codes[:5])
+        start = time.perf_counter()
+        deck.recycle_discard_pile()
+        elapsed += time.perf_counter() - start
+    return _result(rounds, elapsed, "calls")
+
+
+def _play(game, max_turns=MAX_TURNS):
+    for turn in range(1, max_turns + 1):
+        game.play_turn()
+        if game.is_over():
+            return turn
+        game.next_player()
+    return max_turns
+
+
+def bench_logic(rng, scale):
+    TimedPlayer.elapsed = 0.0
+    TimedPlayer.calls = 0
+    for _ in range(200 * scale):
+        game = MakaoGame(DEFAULT_NAMES[:3], seed=rng.getrandbits(64), player_types=[TimedPlayer] * 3)
+        game.prepare_game()
+        _play(game)
+    return _result(TimedPlayer.calls, TimedPlayer.elapsed, "calls")
+
+
+def bench_games(rng, scale, players):
+    games = 200 * scale
+    seeds = [rng.getrandbits(64) for _ in range(games)]
+    turns = 0
+    start = time.perf_counter()
+    for seed in seeds:
+        game = MakaoGame(DEFAULT_NAMES[:players], seed=seed)
+        game.prepare_game()
+        turns += _play(game)
+    elapsed = time.perf_counter() - start
+    return _result(turns, elapsed, "turns", games_per_sec=games / elapsed, turns_per_game=turns / games,
+                   peak_bytes_per_game=_peak_memory(seeds[:5], players))
+
+
+def _peak_memory(seeds, players):
+    """
+    Measures peak memory allocated while creating and playing a single game
+    :return: Average peak in bytes
+    """
+    peaks = []
+    for seed in seeds:
+        tracemalloc.start()
+        game = MakaoGame(DEFAULT_NAMES[:players], seed=seed)
+        game.prepare_game()
+        _play(game)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return sum(peaks) // len(peaks)
+
+
+def _penalty_game(players, seed):
+    """
+    Prepares a game in which every penalty card is dealt out and a 2 starts the stack
+    """
+    game = MakaoGame(DEFAULT_NAMES[:players], seed=seed)
+    penalty = STANDARD_RULES.penalty
+    penalty_codes = [code for code in range(DECK_SIZE) if penalty[code]]
+    other_codes = [code for code in range(DECK_SIZE) if not penalty[code]]
+    game.rng.shuffle(penalty_codes)
+    game.rng.shuffle(other_codes)
+    first = CARDS[penalty_codes.pop()]
+    for idx, code in enumerate(penalty_codes):
+        game.players[idx % players].hand.append(CARDS[code])
+    for player in game.players:
+        player.hand.extend(other_codes[:3])
+        del other_codes[:3]
+    game.deck.arrange([first.code], other_codes)
+    game.table.has_to_draw = True
+    game.table.how_many_to_draw = penalty[first.code]
+    return game
+
+
+def bench_penalty_stacking(rng, scale, players):
+    games = 200 * scale
+    turns = 0
+    elapsed = 0.0
+    for _ in range(games):
+        game = _penalty_game(players, rng.getrandbits(64))
+        start = time.perf_counter()
+        turns += _play(game)
+        elapsed += time.perf_counter() - start
+    return _result(turns, elapsed, "turns", games_per_sec=games / elapsed)
+
+
+def run_benchmarks(seed=0, scale=1, only=None, repeat=3):
+    """
+    Runs the benchmark suite
+    :param seed: Seed of positions and games, so runs are comparable
+    :param scale: Multiplier of the amount of work in every benchmark
+    :param only: Names of benchmarks to run, all by default
+    :param repeat: Number of runs of every benchmark, the fastest one is reported
+    :return: Dictionary of results by benchmark name
+    """
+    benchmarks = {
+        "show_playable_cards": bench_show_playable_cards,
+        "logic": bench_logic,
+        "play_card": bench_play_card,
+        "draw": bench_draw,
+        "recycle_discard_pile": bench_recycle_discard_pile,
+    }
+    for players in (2, 3, 4):
+        benchmarks[f"play_turn_{players}p"] = lambda rng, scale, p=players: bench_games(rng, scale, p)
+        benchmarks[f"penalty_stacking_{players}p"] = (
+            lambda rng, scale, p=players: bench_penalty_stacking(rng, scale, p))
+
+    results = {}
+    for name, bench in benchmarks.items():
+        if only and name not in only:
+            continue
+        runs = [bench(random.Random(f"{seed}:{name}"), scale) for _ in range(repeat)]
+        results[name] = max(runs, key=lambda run: run["rate"])
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compares rates with a stored baseline
+    :param tolerance: Allowed relative slowdown, e.g. 0.1 for 10%
+    :return: List of (name, baseline rate, current rate, relative change, is regression)
+    """
+    rows = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        old_rate = baseline[name]["rate"]
+        change = result["rate"] / old_rate - 1 if old_rate else 0.0
+        rows.append((name, old_rate, result["rate"], change, change < -tolerance))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of the Makao game core")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scale", type=int, default=1, help="Multiplier of the amount of work")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of every benchmark, the fastest is reported")
+    parser.add_argument("--only", nargs="*", help="Names of benchmarks to run")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON file with results to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed relative slowdown")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.seed, args.scale, args.only, args.repeat)
+    for name, result in results.items():
+        extra = "".join(f", {key}: {value:.0f}" for key, value in result.items()
+                        if key not in ("ops", "seconds", "rate", "unit"))
+        print(f"{name:32} {result['rate']:12.0f} {result['unit']}/s{extra}")
+
+    if args.output:
+        report = {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "scale": args.scale,
+            "repeat": args.repeat,
+            "benchmarks": results,
+        }
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)["benchmarks"]
+        regressions = 0
+        print()
+        for name, old_rate, new_rate, change, regression in compare(results, baseline, args.tolerance):
+            regressions += regression
+            flag = "REGRESSION" if regression else ""
+            print(f"{name:32} {old_rate:12.0f} -> {new_rate:12.0f} {change:+7.1%} {flag}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
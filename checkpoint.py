@@ -0,0 +1,170 @@
+import random
+import struct
+
+from events import NULL_LOG
+from metrics import NULL_METRICS
+from game import (CARDS, RANK_INDEX, RANKS, SUIT_INDEX, SUITS, CardDeck, Hand, MakaoGame, Player,
+                  TableState)
+
+MAGIC = b"MKO"
+VERSION = 2
+NONE = 0xFF
+
+# Flagi nagłówka
+WITH_RNG = 1
+# Flagi stołu
+HAS_TO_DRAW = 1
+HAS_TO_WAIT = 2
+# Flagi gracza
+IS_WAITING = 1
+PLAYED_CARD = 2
+HAS_DRAWN = 4
+
+# magic, wersja, flagi, liczba graczy, obecny gracz, kierunek
+_HEADER = struct.Struct("<3sBBBBb")
+# wielkość stosu odrzuconych, pozycja wierzchu talii, liczba przetasowań, liczba kart w buforze (kilka talii)
+_DECK = struct.Struct("<HHIH")
+# żądanie, zmiana koloru, flagi, drawn_countJ, how_many_to_draw, how_much_to_wait
+_TABLE = struct.Struct("<BBBBHB")
+# player_id, flagi, waiting, ostatnio zagrana karta, cards_drawn, długość nazwy, liczba kart w ręce
+_PLAYER = struct.Struct("<BBBBHBH")
+# stan Mersenne Twister (624 słowa i indeks) i gauss_next
+_RNG = struct.Struct("<625Id")
+
+
+def pack_table(table):
+    """
+    Saves pending effects of the table; shared with replay.py
+    :param table: TableState
+    :return: bytes
+    """
+    return _TABLE.pack(RANK_INDEX[table.demand] if table.demand is not None else NONE,
+                       SUIT_INDEX[table.change_of_suit] if table.change_of_suit is not None else NONE,
+                       table.has_to_draw * HAS_TO_DRAW | table.has_to_wait * HAS_TO_WAIT, table.drawn_countJ,
+                       table.how_many_to_draw, table.how_much_to_wait)
+
+
+def unpack_table(data, offset, table):
+    """
+    Reads pending effects saved by pack_table into table
+    :return: Offset after the saved table
+    """
+    demand, change_of_suit, table_flags, table.drawn_countJ, table.how_many_to_draw, table.how_much_to_wait = \
+        _TABLE.unpack_from(data, offset)
+    table.demand = RANKS[demand] if demand != NONE else None
+    table.change_of_suit = SUITS[change_of_suit] if change_of_suit != NONE else None
+    table.has_to_draw = bool(table_flags & HAS_TO_DRAW)
+    table.has_to_wait = bool(table_flags & HAS_TO_WAIT)
+    return offset + _TABLE.size
+
+
+def player_flags(player):
+    """
+    :return: Turn flags of the player (is_waiting, played_card, has_drawn) as one byte value
+    """
+    return player.is_waiting * IS_WAITING | player.played_card * PLAYED_CARD | player.has_drawn * HAS_DRAWN
+
+
+def set_player_flags(player, flags):
+    """
+    Restores turn flags saved by player_flags
+    """
+    player.is_waiting = bool(flags & IS_WAITING)
+    player.played_card = bool(flags & PLAYED_CARD)
+    player.has_drawn = bool(flags & HAS_DRAWN)
+
+
+def dumps(game, with_rng=True):
+    """
+    Saves the complete state of a game in a compact binary form: both piles, hands, the current player,
+    pending effects of the table and turn flags of every player
+    :param game: MakaoGame to save
+    :param with_rng: Whether to save the state of the game's random generator, so the restored game continues
+                     exactly like the original
+    :return: bytes
+    """
+    players = game.players
+    table = game.table
+    deck = game.deck
+    parts = [
+        _HEADER.pack(MAGIC, VERSION, WITH_RNG if with_rng else 0, len(players), game.current_player_index,
+                     game.direction),
+        _DECK.pack(deck.discard_size, deck.draw_pos, deck.reshuffles, len(deck.buffer)),
+        bytes(deck.buffer),
+        pack_table(table),
+    ]
+    for player in players:
+        name = player.name.encode()
+        parts.append(_PLAYER.pack(player.player_id, player_flags(player), player.waiting,
+                                  player.last_card_played.code if player.last_card_played is not None else NONE,
+                                  player.cards_drawn, len(name), len(player.hand)))
+        parts.append(name)
+        parts.append(bytes(player.hand.codes))
+    if with_rng:
+        _, internal, gauss_next = game.rng.getstate()
+        parts.append(_RNG.pack(*internal, gauss_next if gauss_next is not None else float("nan")))
+    return b"".join(parts)
+
+
+def loads(data, player_types=None, log=None, rules=None):
+    """
+    Restores a game saved by dumps
+    :param data: bytes from dumps
+    :param player_types: Player class for every seat, Player by default
+    :param log: EventLog of the restored game, silent by default
+    :param rules: RuleSet of the saved game, which is not part of the checkpoint; STANDARD_RULES by default
+    :return: New MakaoGame
+    """
+    magic, version, flags, players_count, current, direction = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not a Makao checkpoint")
+    if version != VERSION:
+        raise ValueError(f"Unsupported checkpoint version: {version}")
+    offset = _HEADER.size
+
+    game = MakaoGame.__new__(MakaoGame)
+    game.log = log if log is not None else NULL_LOG
+    game.metrics = NULL_METRICS
+    game.seed = None
+    game.rng = random.Random()
+
+    deck = game.deck = CardDeck.__new__(CardDeck)
+    deck.rng = game.rng
+    deck.metrics = NULL_METRICS
+    deck.discard_size, deck.draw_pos, deck.reshuffles, buffer_size = _DECK.unpack_from(data, offset)
+    offset += _DECK.size
+    deck.buffer = bytearray(data[offset:offset + buffer_size])
+    offset += buffer_size
+
+    table = game.table = TableState(players_count, rules)
+    offset = unpack_table(data, offset, table)
+
+    if player_types is None:
+        player_types = [Player] * players_count
+    game.players = []
+    for player_type in player_types[:players_count]:
+        player_id, turn_flags, waiting, last_card, cards_drawn, name_size, hand_size = \
+            _PLAYER.unpack_from(data, offset)
+        offset += _PLAYER.size
+        player = player_type(data[offset:offset + name_size].decode(), player_id, table)
+        offset += name_size
+        player.hand = Hand()
+        player.hand.extend(data[offset:offset + hand_size])
+        offset += hand_size
+        set_player_flags(player, turn_flags)
+        player.waiting = waiting
+        player.last_card_played = CARDS[last_card] if last_card != NONE else None
+        player.cards_drawn = cards_drawn
+        player.log = game.log
+        player.game = game
+        game.players.append(player)
+    if len(game.players) != players_count:
+        raise ValueError("Player type missing for a seat")
+
+    if flags & WITH_RNG:
+        *internal, gauss_next = _RNG.unpack_from(data, offset)
+        game.rng.setstate((3, tuple(internal), None if gauss_next != gauss_next else gauss_next))
+    game.current_player_index = current
+    game.current_player = game.players[current]
+    game.direction = direction
+    return game
@@ -0,0 +1,78 @@
+import json
+
+# Poziomy szczegółowości dziennika zdarzeń
+SILENT = 0
+TURNS = 1
+VERBOSE = 2
+
+
+class EventLog:
+    """
+    Level-gated log of game events. An event is a dict with an "event" key naming its kind.
+    Code emitting events checks `log.level` first, so a silent log costs a single comparison.
+    """
+
+    def __init__(self, level=TURNS, sinks=()):
+        """
+        :param level: SILENT, TURNS (structured turn events) or VERBOSE (also hands and deck contents)
+        :param sinks: Callables receiving every emitted event
+        """
+        self.level = level
+        self.sinks = list(sinks)
+
+    def emit(self, kind, **fields):
+        """
+        Sends an event to all sinks
+        :param kind: Kind of event, e.g. "turn"
+        :param fields: Event data
+        """
+        fields["event"] = kind
+        for sink in self.sinks:
+            sink(fields)
+
+
+NULL_LOG = EventLog(SILENT)
+
+
+class JsonLinesSink:
+    """
+    Writes every event as one line of JSON
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def __call__(self, event):
+        self.stream.write(json.dumps(event, ensure_ascii=False))
+        self.stream.write("\n")
+
+
+def console_sink(event):
+    """
+    Prints events in the same form as the console output of the game
+    :param event: Event to print
+    """
+    kind = event["event"]
+    if kind == "game_start":
+        print(f"Pierwsza karta na stosie odrzuconych: {event['first_card']}")
+    elif kind == "deck":
+        print(", ".join(event["cards"]))
+    elif kind == "hand":
+        print(f"\nTura {event['player']}. Obecna ręka: {', '.join(event['hand'])}")
+        print(" ".join(event["playable"]))
+        print(f"Current card: {event['top']}")
+    elif kind == "reshuffle":
+        print(f"Utworzono nową talię ({event['cards']} kart)")
+    elif kind == "demand":
+        print(f"Żądam: {event['rank']}")
+    elif kind == "suit_change":
+        print(f"Zmiana koloru na: {event['suit']}")
+    elif kind == "penalty_draw":
+        print(f"Dobrano {event['cards']}")
+    elif kind == "turn":
+        if event["played"]:
+            print(f"{event['player']} zagrał {', '.join(event['played'])}")
+        else:
+            print(f"{event['player']} nie mógł zagrać")
+    elif kind == "win":
+        print(f"{event['player']} wygrał!")
@@ -1,97 +1,591 @@
+import copy
+import json
 import random
+from collections import namedtuple
+from time import perf_counter
+
+from events import NULL_LOG, VERBOSE
+from metrics import NULL_METRICS
+
+SUITS = ['Hearts', 'Diamonds', 'Clubs', 'Spades']
+RANKS = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
+
+# Numery rang i kolorów używane w porównaniach zamiast napisów
+TWO, THREE, FOUR, JACK, QUEEN, KING, ACE = 0, 1, 2, 9, 10, 11, 12
+HEARTS, DIAMONDS, CLUBS, SPADES = 0, 1, 2, 3
+RANK_INDEX = {rank: idx for idx, rank in enumerate(RANKS)}
+SUIT_INDEX = {suit: idx for idx, suit in enumerate(SUITS)}
+DECK_SIZE = len(SUITS) * len(RANKS)
+# Liczba kart rozdawanych każdemu graczowi na początku gry
+HAND_SIZE = 5
+# Największa liczba połączonych talii; max_players(MAX_DECKS) mieści numer gracza w jednym bajcie zapisu
+# checkpoint.py i replay.py
+MAX_DECKS = 4
 
 
 class Card:
-    def __init__(self, rank, suit):
-        self.rank = rank
-        self.suit = suit
+    """
+    Playing card. Every rank and suit pair has exactly one shared instance, identified by its code 0-51;
+    with several decks, all copies of a card are the same instance
+    """
+    __slots__ = ('rank', 'suit', 'code', 'rank_id', 'suit_id', 'name')
+    _interned = {}
+
+    def __new__(cls, rank, suit):
+        card = cls._interned.get((rank, suit))
+        if card is None:
+            card = super().__new__(cls)
+            card.rank = rank
+            card.suit = suit
+            card.rank_id = RANK_INDEX[rank]
+            card.suit_id = SUIT_INDEX[suit]
+            card.code = card.suit_id * len(RANKS) + card.rank_id
+            card.name = f"{rank} of {suit}"
+            cls._interned[(rank, suit)] = card
+        return card
+
+    def __reduce__(self):
+        return Card, (self.rank, self.suit)
+
+    def __str__(self):
+        return self.name
+
+
+# Karty według kodu oraz tablice ich cech, liczone raz przy imporcie
+CARDS = tuple(Card(rank, suit) for suit in SUITS for rank in RANKS)
+RANK_OF = bytes(card.rank_id for card in CARDS)
+SUIT_OF = bytes(card.suit_id for card in CARDS)
+# Kolejność rang przy sortowaniu ręki (alfabetyczna, jak przy sortowaniu napisów)
+RANK_SORT_KEY = bytes(sorted(RANKS).index(card.rank) for card in CARDS)
+RANK_ORDER = sorted(range(len(RANKS)), key=RANKS.__getitem__)
+# Rangi w kolejności RANK_ORDER dla każdego zbioru rang zapisanego na 13 bitach
+RANK_SETS = [tuple(rank_id for rank_id in RANK_ORDER if ranks >> rank_id & 1) for ranks in range(1 << len(RANKS))]
+
+# Maski bitowe: bit o numerze kodu karty jest ustawiony, gdy karta należy do zbioru
+ALL_CARDS_MASK = (1 << DECK_SIZE) - 1
+RANK_MASK = [sum(1 << card.code for card in CARDS if card.rank_id == rank) for rank in range(len(RANKS))]
+SUIT_MASK = [sum(1 << card.code for card in CARDS if card.suit_id == suit) for suit in range(len(SUITS))]
+# Brak żądania i brak zmiany koloru mają własne, ostatnie pozycje w tablicy ruchów
+DEMAND_SLOT = {rank: idx for idx, rank in enumerate(RANKS)}
+DEMAND_SLOT[None] = len(RANKS)
+SUIT_SLOT = {suit: idx for idx, suit in enumerate(SUITS)}
+SUIT_SLOT[None] = len(SUITS)
 
-    def is_functional_card(self):
+
+# Działanie karty zagranej na stos
+NO_EFFECT, DEMAND, PENALTY_DRAW, SUIT_CHANGE, WAIT, REVERSE = 0, 1, 2, 3, 4, 5
+
+
+class RuleSet:
+    """
+    House rules of Makao given as data and compiled once into tables by card code, so that a variant costs
+    nothing per turn. Every place that applies the rules (Player, the GUI, search and simulations) reads
+    the rules of the game from TableState.rules.
+    """
+
+    def __init__(self, penalties=None, penalty_groups=(("2", "3"), ("K",)), wait_ranks=("4",),
+                 demand_ranks=("J",), demandable_ranks=None, suit_change_ranks=("A",), wild_ranks=("Q",),
+                 reverse_ranks=()):
+        """
+        :param penalties: Cards to draw for every penalty card, by rank ("2") or by card name ("K of Hearts");
+                          2, 3 and 5 for the kings of hearts and spades by default
+        :param penalty_groups: Ranks whose penalty cards answer each other in the same suit; a penalty card
+                               is always answered with a penalty card of the same rank
+        :param wait_ranks: Ranks that make the next player lose a turn unless they answer with the same rank
+        :param demand_ranks: Ranks that let the player demand a rank
+        :param demandable_ranks: Ranks that may be demanded, all ranks without a function by default
+        :param suit_change_ranks: Ranks that let the player change the suit
+        :param wild_ranks: Ranks that may be played on any card and on which any card may be played
+        :param reverse_ranks: Ranks that reverse the direction of play
         """
-            Checks if the card is a functional card.
+        if penalties is None:
+            penalties = {"2": 2, "3": 3, "K of Hearts": 5, "K of Spades": 5}
+        self.definition = {"penalties": dict(penalties), "penalty_groups": [list(group) for group in penalty_groups],
+                           "wait_ranks": list(wait_ranks), "demand_ranks": list(demand_ranks),
+                           "demandable_ranks": list(demandable_ranks) if demandable_ranks is not None else None,
+                           "suit_change_ranks": list(suit_change_ranks), "wild_ranks": list(wild_ranks),
+                           "reverse_ranks": list(reverse_ranks)}
+        names = {card.name: card for card in CARDS}
+        penalty = [0] * DECK_SIZE
+        for key, value in penalties.items():
+            if key in RANK_INDEX:
+                cards = [card for card in CARDS if card.rank == key]
+            elif key in names:
+                cards = [names[key]]
+            else:
+                raise ValueError(f"Unknown card or rank: {key}")
+            for card in cards:
+                penalty[card.code] = value
+        self.penalty = bytes(penalty)
+
+        effect = [NO_EFFECT] * DECK_SIZE
+        for ranks, kind in ((demand_ranks, DEMAND), (suit_change_ranks, SUIT_CHANGE), (wait_ranks, WAIT),
+                            (reverse_ranks, REVERSE)):
+            for rank in ranks:
+                for card in CARDS:
+                    if card.rank == _check_rank(rank):
+                        if effect[card.code] != NO_EFFECT or penalty[card.code]:
+                            raise ValueError(f"{card.name} has more than one function")
+                        effect[card.code] = kind
+        for code, value in enumerate(penalty):
+            if value:
+                effect[code] = PENALTY_DRAW
+        self.effect = bytes(effect)
+        self.wild_ranks = [_check_rank(rank) for rank in wild_ranks]
+        if any(effect[card.code] for card in CARDS if card.rank in self.wild_ranks):
+            raise ValueError("Wild cards cannot have another function")
+
+        self.functional_ranks = {card.rank for card in CARDS if effect[card.code]} | set(self.wild_ranks)
+        self.functional = bytes(card.rank in self.functional_ranks for card in CARDS)
+        self.non_functional_mask = sum(1 << card.code for card in CARDS if not self.functional[card.code])
+        if demandable_ranks is None:
+            demandable_ranks = [rank for rank in RANKS if rank not in self.functional_ranks]
+        self.demandable_ranks = [_check_rank(rank) for rank in demandable_ranks]
+        self.demandable_mask = sum(RANK_MASK[RANK_INDEX[rank]] for rank in self.demandable_ranks)
+
+        group_of = {}
+        for group in penalty_groups:
+            for rank in group:
+                group_of[_check_rank(rank)] = [RANK_INDEX[other] for other in group]
+        self.wild_mask = sum(RANK_MASK[RANK_INDEX[rank]] for rank in self.wild_ranks)
+        self.suit_change_mask = sum(RANK_MASK[RANK_INDEX[rank]] for rank in suit_change_ranks)
+        penalty_mask = sum(1 << code for code, value in enumerate(penalty) if value)
+        # Karty odpowiadające na kartę karną i karty, które dobrane zamiast kary można od razu zagrać
+        self.penalty_answers = []
+        self.penalty_peek = []
+        for top in CARDS:
+            same_suit = sum(1 << (top.suit_id * len(RANKS) + rank) for rank in group_of.get(top.rank, ()))
+            self.penalty_answers.append((RANK_MASK[top.rank_id] | same_suit) & penalty_mask)
+            self.penalty_peek.append(RANK_MASK[top.rank_id] | same_suit)
+
+        self.legal_moves = [self._legal_mask(top, has_to_draw, has_to_wait, demand, change_of_suit)
+                            for top in CARDS
+                            for has_to_draw in (False, True)
+                            for has_to_wait in (False, True)
+                            for demand in [*range(len(RANKS)), None]
+                            for change_of_suit in [*range(len(SUITS)), None]]
 
-            Returns:
-                bool: True if the card is functional (e.g., '2', '3', '4', 'J', 'Q', 'K', 'A'), False otherwise.
+    def _legal_mask(self, top, has_to_draw, has_to_wait, demand, change_of_suit):
         """
-        functional_ranks = {'2', '3', '4', 'J', 'Q', 'K', 'A'}
-        return self.rank in functional_ranks
+        Computes the mask of cards that may be played
+        :param top: Card on top of discard pile
+        :param demand: Demanded rank id or None
+        :param change_of_suit: Chosen suit id or None
+        :return: Mask of legal cards
+        """
+        effect = self.effect[top.code]
+        if effect == PENALTY_DRAW and has_to_draw:
+            return self.penalty_answers[top.code]
+        if effect == WAIT and has_to_wait:
+            return RANK_MASK[top.rank_id]
+        if demand is not None:
+            return RANK_MASK[demand]
+        if top.rank in self.wild_ranks:
+            return ALL_CARDS_MASK
+        if effect == SUIT_CHANGE and change_of_suit is not None:
+            return self.suit_change_mask | SUIT_MASK[change_of_suit] | self.wild_mask
+        return SUIT_MASK[top.suit_id] | RANK_MASK[top.rank_id] | self.wild_mask
+
+    def is_response(self, current_card, table):
+        """
+        :return: Whether a move on current_card answers a pending penalty, block or demand instead of being free
+        """
+        effect = self.effect[current_card.code]
+        return (effect == PENALTY_DRAW and table.has_to_draw or effect == WAIT and table.has_to_wait or
+                table.demand is not None)
+
+    def __reduce__(self):
+        # Zamiast tablic przesyłana jest definicja, kompilowana najwyżej raz w każdym procesie
+        return rules_from_definition, (self.definition,)
+
+
+def _check_rank(rank):
+    if rank not in RANK_INDEX:
+        raise ValueError(f"Unknown rank: {rank}")
+    return rank
+
+
+_compiled_rules = {}
+
+
+def rules_from_definition(definition):
+    """
+    Returns the rule set of a definition, e.g. one read from a JSON file, compiling it only the first time
+    :param definition: Dictionary of RuleSet arguments, like RuleSet.definition
+    :return: RuleSet
+    """
+    key = json.dumps(definition, sort_keys=True)
+    rules = _compiled_rules.get(key)
+    if rules is None:
+        rules = RuleSet(**definition)
+        # Ta sama definicja zapisana w pełnej postaci (np. po przesłaniu do procesu) daje ten sam obiekt
+        rules = _compiled_rules.setdefault(json.dumps(rules.definition, sort_keys=True), rules)
+        _compiled_rules[key] = rules
+    return rules
+
+
+STANDARD_RULES = rules_from_definition({})
+
+
+def legal_moves(current_card, table):
+    """
+    Looks up which cards may be played on current card in the given table state
+    :param current_card: Card on top of discard pile
+    :param table: TableState with pending effects
+    :return: Mask of legal cards
+    """
+    return table.rules.legal_moves[(((current_card.code << 1 | table.has_to_draw) << 1 | table.has_to_wait)
+                                    * (len(RANKS) + 1) + DEMAND_SLOT[table.demand]) * (len(SUITS) + 1)
+                                   + SUIT_SLOT[table.change_of_suit]]
+
+
+# Widok decyzji dla strategii: karty jako kody, ruchy jako krotki kodów (ostatnia karta ląduje na wierzchu)
+Observation = namedtuple("Observation", ["seat", "hand", "top", "moves", "response", "demand", "change_of_suit",
+                                         "to_draw", "has_to_wait", "hand_sizes", "discarded", "cards_left"])
+
+
+def candidate_moves(playable_cards, response=False):
+    """
+    Lists legal moves among playable cards. An answer to a penalty, block or demand is a single card;
+    a free move plays all playable cards of one rank, and there is a move for every card that may end on top.
+    :param playable_cards: Playable cards, in hand order
+    :param response: Whether the move answers a pending penalty, block or demand
+    :return: Tuple of moves, each a tuple of card codes in play order
+    """
+    if response:
+        return tuple(dict.fromkeys((card.code,) for card in playable_cards))
+    moves = {}
+    for idx, card in enumerate(playable_cards):
+        # Kopie tej samej karty z kilku talii są jednym obiektem, więc pomijana jest karta o tej pozycji
+        same_rank = [other.code for pos, other in enumerate(playable_cards) if other.rank_id == card.rank_id and
+                     pos != idx]
+        moves[(*same_rank, card.code)] = None
+    return tuple(moves)
+
+
+def _ranks_of(mask):
+    """
+    :return: Set of ranks of the cards in mask, as a 13-bit number
+    """
+    return (mask | mask >> 13 | mask >> 26 | mask >> 39) & 0x1FFF
+
+
+class Hand:
+    """
+    Cards held by a player, kept in buckets of card codes by rank together with a mask of the same cards.
+    Buckets are visited in RANK_ORDER and keep the order in which their cards were added, so the hand is always
+    ordered as a stable sort by rank would order it.
+    With several decks a hand may hold copies of a card: buckets hold every copy and the mask bit of a card
+    stays set while any copy is left. Iterating yields shared Card instances
+    """
+    __slots__ = ('buckets', 'mask', 'size')
+
+    def __init__(self, cards=()):
+        self.buckets = [bytearray() for _ in RANKS]
+        self.mask = 0
+        self.size = 0
+        for card in cards:
+            self.append(card)
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        buckets = self.buckets
+        for rank_id in RANK_ORDER:
+            for code in buckets[rank_id]:
+                yield CARDS[code]
+
+    def __contains__(self, card):
+        return self.mask >> card.code & 1 == 1
+
+    @property
+    def codes(self):
+        """
+        Codes of all cards in hand order
+        """
+        return b"".join([self.buckets[rank_id] for rank_id in RANK_ORDER])
+
+    def append(self, card):
+        self.buckets[card.rank_id].append(card.code)
+        self.mask |= 1 << card.code
+        self.size += 1
+
+    def extend(self, codes):
+        """
+        Adds cards given by their codes
+        """
+        buckets = self.buckets
+        for code in codes:
+            buckets[RANK_OF[code]].append(code)
+            self.mask |= 1 << code
+        self.size += len(codes)
+
+    def remove(self, card):
+        bucket = self.buckets[card.rank_id]
+        bucket.remove(card.code)
+        if card.code not in bucket:
+            self.mask &= ~(1 << card.code)
+        self.size -= 1
+
+    def copy(self):
+        hand = Hand.__new__(Hand)
+        hand.buckets = [bytearray(bucket) for bucket in self.buckets]
+        hand.mask = self.mask
+        hand.size = self.size
+        return hand
+
+    def select(self, mask):
+        """
+        Returns cards of the hand whose bits are set in mask, visiting only buckets of matching ranks
+        :param mask: Mask of wanted cards
+        :return: List of cards in hand order
+        """
+        mask &= self.mask
+        cards = []
+        if mask:
+            buckets = self.buckets
+            for rank_id in RANK_SETS[_ranks_of(mask)]:
+                for code in buckets[rank_id]:
+                    if mask >> code & 1:
+                        cards.append(CARDS[code])
+        return cards
+
+    def first(self, mask):
+        """
+        :return: First card of the hand in hand order whose bit is set in mask, None if there is none
+        """
+        mask &= self.mask
+        if mask:
+            for code in self.buckets[RANK_SETS[_ranks_of(mask)][0]]:
+                if mask >> code & 1:
+                    return CARDS[code]
+        return None
+
+    def last(self):
+        """
+        :return: Last card of the hand in hand order, None for an empty hand
+        """
+        for rank_id in reversed(RANK_ORDER):
+            if self.buckets[rank_id]:
+                return CARDS[self.buckets[rank_id][-1]]
+        return None
 
     def __str__(self):
-        return f"{self.rank} of {self.suit}"
+        return ", ".join(card.name for card in self)
 
 
 class CardDeck:
-    suits = ['Hearts', 'Diamonds', 'Clubs', 'Spades']
-    ranks = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
+    """
+    Draw pile and discard pile of one table, kept together in a single buffer of card codes, so the number of cards
+    in the game never changes. The discard pile grows from the start of the buffer (top card last), the draw pile
+    takes the end of the buffer (top card first) and the cards held by players are the gap between them.
+    When the draw pile runs out, the discard pile without its top card is moved under it in place and shuffled.
+    A deck of several combined decks holds every card code that many times.
+    """
+    suits = SUITS
+    ranks = RANKS
 
-    def __init__(self):
-        self.cards = [Card(rank, suit) for suit in self.suits for rank in self.ranks]
+    def __init__(self, rng=None, decks=1):
+        """
+        :param rng: random.Random instance used for shuffling, a new unseeded one by default
+        :param decks: Number of combined 52-card decks
+        """
+        self.rng = rng if rng is not None else random.Random()
+        self.buffer = bytearray(range(DECK_SIZE)) * decks
+        self.discard_size = 0
+        self.draw_pos = 0
+        self.reshuffles = 0
+        self.metrics = NULL_METRICS
         self.shuffle()
-        print(', '.join(str(card) for card in self.cards))
 
     def __str__(self):
-        return ', '.join(str(card) for card in self.cards)
+        return ', '.join(CARDS[code].name for code in self.buffer[self.draw_pos:])
 
     def draw_card(self):
         """
-        Draws a card from the deck.
+        Draws a card from the deck, recycling the discard pile if the deck is empty.
 
-        :return: Card or None: The drawn card if the deck is not empty, otherwise None.
+        :return: Card or None: The drawn card if there is any card left outside players' hands, otherwise None.
         """
-
-        if self.cards:
-            return self.cards.pop()
-        else:
+        if self.draw_pos == len(self.buffer) and not self.recycle_discard_pile():
             return None
+        code = self.buffer[self.draw_pos]
+        self.draw_pos += 1
+        return CARDS[code]
+
+    def draw_cards(self, quantity):
+        """
+        Draws several cards at once, recycling the discard pile when the deck runs out in the middle
+        :param quantity: How many cards to draw
+        :return: Codes of drawn cards, fewer than quantity if there are not enough cards outside players' hands
+        """
+        buffer = self.buffer
+        end = self.draw_pos + quantity
+        if end <= len(buffer):
+            drawn = buffer[self.draw_pos:end]
+            self.draw_pos = end
+            return drawn
+        drawn = buffer[self.draw_pos:]
+        self.draw_pos = len(buffer)
+        if self.recycle_discard_pile():
+            end = min(self.draw_pos + quantity - len(drawn), len(buffer))
+            drawn += buffer[self.draw_pos:end]
+            self.draw_pos = end
+        return drawn
+
+    def recycle_discard_pile(self):
+        """
+        Moves the discard pile without its top card under the deck and shuffles the deck
+        :return: True if any card was moved
+        """
+        count = self.discard_size - 1
+        if count <= 0:
+            return False
+        metrics = self.metrics
+        if metrics.enabled:
+            started = perf_counter()
+        buffer = self.buffer
+        top = buffer[count]
+        start = self.draw_pos - count
+        with memoryview(buffer) as view:
+            view[start:self.draw_pos] = view[:count]
+            self.rng.shuffle(view[start:])
+        buffer[0] = top
+        self.draw_pos = start
+        self.discard_size = 1
+        self.reshuffles += 1
+        if metrics.enabled:
+            metrics.observe("recycle", perf_counter() - started)
+            metrics.count("reshuffles")
+        return True
+
+    def discard(self, card):
+        """
+        Puts a card played from a hand on top of the discard pile
+        """
+        self.buffer[self.discard_size] = card.code
+        self.discard_size += 1
+
+    def top_card(self):
+        """
+        :return: Card on top of the discard pile
+        """
+        return CARDS[self.buffer[self.discard_size - 1]]
+
+    def discarded_codes(self):
+        """
+        :return: Codes of the discard pile, top card last
+        """
+        return self.buffer[:self.discard_size]
+
+    def arrange(self, discard, draw):
+        """
+        Sets the contents of both piles, e.g. to deal prepared hands; all other cards are held by players
+        :param discard: Codes of the discard pile, top card last
+        :param draw: Codes of the deck, top card first
+        """
+        self.discard_size = len(discard)
+        self.draw_pos = len(self.buffer) - len(draw)
+        self.buffer[:self.discard_size] = bytes(discard)
+        self.buffer[self.draw_pos:] = bytes(draw)
+
+    def copy(self, rng=None):
+        """
+        Copies the deck keeping the order of cards
+        :param rng: Random generator of the copy, shared with the original by default
+        """
+        deck = CardDeck.__new__(CardDeck)
+        deck.rng = rng if rng is not None else self.rng
+        deck.buffer = bytearray(self.buffer)
+        deck.discard_size = self.discard_size
+        deck.draw_pos = self.draw_pos
+        deck.reshuffles = self.reshuffles
+        deck.metrics = NULL_METRICS
+        return deck
+
+    def put_card(self, card):
+        """
+        Puts a card drawn from the deck back on top of it
+        """
+        self.draw_pos -= 1
+        self.buffer[self.draw_pos] = card.code
 
     def cards_left(self):
-        return len(self.cards)
+        return len(self.buffer) - self.draw_pos
 
     def shuffle(self):
-        random.shuffle(self.cards)
+        with memoryview(self.buffer) as view:
+            self.rng.shuffle(view[self.draw_pos:])
 
-    def create_deck_from_discard_pile(self, discard_pile):
+    def first_card(self):
         """
-        Creates deck of cards from given discard_pile
-        :param discard_pile: Cards from discard pile
-        :return:
+        :return: Card on top of the deck, None if there is no card left outside players' hands
         """
-        for card in discard_pile:
-            self.cards.append(card)
-        self.shuffle()
-        return self.cards
+        if self.draw_pos == len(self.buffer) and not self.recycle_discard_pile():
+            return None
+        return CARDS[self.buffer[self.draw_pos]]
 
-    def first_card(self):
-        return self.cards[-1]
+
+class TableState:
+    """
+    Pending effects of played special cards and the rules of the game, shared by all players sitting at one table
+    """
+
+    def __init__(self, players_count=0, rules=None):
+        self.rules = rules if rules is not None else STANDARD_RULES
+        self.demand = None
+        self.change_of_suit = None
+        self.has_to_draw = False
+        self.has_to_wait = False
+        self.drawn_countJ = 0
+        self.how_many_to_draw = 0
+        self.how_much_to_wait = 0
+        self.players_count = players_count
+
+    def copy(self):
+        return copy.copy(self)
 
 
 class Player:
-    id = 1
-    demand = None
-    change_of_suit = None
-    has_to_draw = False
-    has_to_wait = False
-    drawn_countJ = 0
-    how_many_to_draw = 0
-    how_much_to_wait = 0
-
-    def __init__(self, name):
-        self.player_id = Player.id
+    def __init__(self, name, player_id=1, table=None):
+        self.player_id = player_id
+        self.table = table if table is not None else TableState(1)
         self.name = name
-        self.hand = []
+        self.hand = Hand()
         self.is_waiting = False
         self.waiting = 0
         self.played_card = False
         self.last_card_played = None
         self.has_drawn = False
-        Player.id += 1
+        self.cards_drawn = 0
+        self.cards_played = ()
+        self.log = NULL_LOG
+        self.metrics = NULL_METRICS
+        self.game = None
+
+    def copy(self, table, player_type=None):
+        """
+        Copies player's hand and turn flags, e.g. to seat a different kind of player in a copy of the game
+        :param table: Table state of the copy
+        :param player_type: Class of the copy, the same as the original by default
+        :return: New player
+        """
+        player = (player_type or type(self))(self.name, self.player_id, table)
+        player.hand = self.hand.copy()
+        player.is_waiting = self.is_waiting
+        player.waiting = self.waiting
+        player.played_card = self.played_card
+        player.last_card_played = self.last_card_played
+        player.has_drawn = self.has_drawn
+        return player
 
     def show_all_non_special_cards(self):
         """
         Returns list of all non-special cards in hand
         :return: List of all non-special cards in hand
         """
-        return [card for card in self.hand if not card.is_functional_card()]
+        return self.hand.select(self.table.rules.non_functional_mask)
 
     def set_how_many_to_draw(self, num):
         """
@@ -99,21 +593,17 @@ class Player:
         :param num: Number of cards to draw
         """
         if num == 0:
-            Player.how_many_to_draw = 0
+            self.table.how_many_to_draw = 0
         else:
-            Player.how_many_to_draw += num
+            self.table.how_many_to_draw += num
 
-    def count_card_ranks(self, cards):
-        rank_count = {}
-        for card in cards:
-            if card.rank in rank_count:
-                rank_count[card.rank] += 1
-            else:
-                rank_count[card.rank] = 1
-        return rank_count
-
-    def order_hand(self):
-        self.hand.sort(key=lambda card_to_sort: card_to_sort.rank)
+    def playable_mask(self, current_card):
+        """
+        Returns mask of playable cards in hand based on current card
+        :param current_card: Card on top of discard pile
+        :return: Mask with bits of playable cards set
+        """
+        return self.hand.mask & legal_moves(current_card, self.table)
 
     def show_playable_cards(self, current_card):
         """
@@ -121,51 +611,59 @@ class Player:
         :param current_card: Card on to of discard pile
         :return: List of playable cards
         """
-        playable_cards = []
-        if current_card.rank == '2' and Player.has_to_draw:
-            playable_cards = [card for card in self.hand if
-                              card.rank == '2' or (card.rank == '3' and card.suit == current_card.suit)]
-        elif current_card.rank == '3' and Player.has_to_draw:
-            playable_cards = [card for card in self.hand if
-                              card.rank == '3' or (card.rank == '2' and card.suit == current_card.suit)]
-        elif current_card.rank == '4' and Player.has_to_wait:
-            playable_cards = [card for card in self.hand if card.rank == '4']
-        elif Player.demand is not None:
-            playable_cards = [card for card in self.hand if card.rank == Player.demand]
-        elif current_card.rank == 'Q':
-            playable_cards = self.hand
-        elif current_card.rank == 'K' and (
-                current_card.suit == "Spades" or current_card.suit == "Hearts") and Player.has_to_draw:
-            playable_cards = [card for card in self.hand if
-                              card.rank == 'K' and (card.suit == "Spades" or card.suit == "Hearts")]
-        elif current_card.rank == 'A' and Player.change_of_suit is not None:
-            playable_cards = [card for card in self.hand if
-                              card.rank == 'A' or card.suit == Player.change_of_suit or card.rank == 'Q']
+        return self.hand.select(legal_moves(current_card, self.table))
+
+    def is_response(self, current_card):
+        """
+        :return: Whether the coming move answers a pending penalty, block or demand instead of being a free move
+        """
+        return self.table.rules.is_response(current_card, self.table)
+
+    def observe(self, current_card, playable_cards=None):
+        """
+        Read-only view of the coming decision: own hand, public state of the table and the legal moves
+        :param current_card: Card on top of discard pile
+        :param playable_cards: Result of show_playable_cards, if already known
+        :return: Observation or None if the turn leaves no choice
+        """
+        if self.waiting:
+            return None
+        if playable_cards is None:
+            playable_cards = self.show_playable_cards(current_card)
+        if not playable_cards:
+            return None
+        table = self.table
+        response = self.is_response(current_card)
+        if self.game is not None:
+            deck = self.game.deck
+            hand_sizes = tuple(len(player.hand) for player in self.game.players)
+            discarded = bytes(deck.discarded_codes())
+            cards_left = deck.cards_left()
         else:
-            playable_cards = [card for card in self.hand if
-                              card.suit == current_card.suit or card.rank == current_card.rank or card.rank == 'Q']
-        return playable_cards
+            hand_sizes = (len(self.hand),)
+            discarded = bytes((current_card.code,))
+            cards_left = 0
+        return Observation(self.player_id - 1, bytes(self.hand.codes), current_card.code,
+                           candidate_moves(playable_cards, response), response, table.demand, table.change_of_suit,
+                           table.how_many_to_draw, table.has_to_wait, hand_sizes, discarded, cards_left)
 
     def draw(self, deck, quantity=1):
         """
         Appends new card to player's hand
         :param deck: Deck of card from which a card will be drawn
         :param quantity: How many cards will be drawn
-        :return: Drawn cards
+        :return: Drawn cards, fewer than quantity if all other cards are in players' hands
         """
+        metrics = self.metrics
+        if metrics.enabled:
+            start = perf_counter()
         self.has_drawn = True
-        drawn_cards = []
-        for _ in range(quantity):
-            card = deck.draw_card()
-            if card:
-                self.hand.append(card)
-            else:
-                print("STWORZONO NOWĄ TALIĘ")
-                deck = CardDeck()
-                card = deck.draw_card()
-                self.hand.append(card)
-            drawn_cards.append(card)
-        return drawn_cards
+        codes = deck.draw_cards(quantity)
+        self.hand.extend(codes)
+        self.cards_drawn += len(codes)
+        if metrics.enabled:
+            metrics.observe("draw", perf_counter() - start)
+        return [CARDS[code] for code in codes]
 
     def play_card(self, cards):
         """
@@ -178,31 +676,59 @@ class Player:
                 self.hand.remove(cards[i])
         card = cards[-1]
         self.last_card_played = card
+        self.cards_played = cards
         if card in self.hand:
-            if card.rank == 'J':
-                to_demand = self.show_all_non_special_cards()
-                if to_demand:
-                    self.show_all_non_special_cards().sort(key=lambda card_to_sort: card.rank)
-                    Player.drawn_countJ = 1
-                    Player.demand = to_demand[0].rank
-                    print(f"Żądam: {Player.demand}")
-                    Player.has_to_draw = True
-            elif card.rank == '2' or card.rank == '3' or (
-                    card.rank == 'K' and (card.suit == "Hearts" or card.suit == "Spades")):
-                Player.has_to_draw = True
-                to_add = 5 if card.rank == 'K' else int(card.rank)
-                self.set_how_many_to_draw(to_add)
-            elif card.rank == 'A':
-                Player.change_of_suit = self.hand[-1].suit
-                print(f"Zmiana koloru na: {Player.change_of_suit}")
-            elif card.rank == '4':
-                Player.has_to_wait = True
+            rules = self.table.rules
+            effect = rules.effect[card.code]
+            if effect == DEMAND:
+                to_demand = self.hand.first(rules.demandable_mask)
+                if to_demand is not None:
+                    self.table.drawn_countJ = 1
+                    self.table.demand = to_demand.rank
+                    if self.log.level:
+                        self.log.emit("demand", player=self.name, rank=self.table.demand)
+                    self.table.has_to_draw = True
+            elif effect == PENALTY_DRAW:
+                self.table.has_to_draw = True
+                self.set_how_many_to_draw(rules.penalty[card.code])
+            elif effect == SUIT_CHANGE:
+                # As dobrany w tej turze był ostatni w ręce, więc zmienia kolor na własny
+                self.table.change_of_suit = card.suit if self.has_drawn else self.hand.last().suit
+                if self.log.level:
+                    self.log.emit("suit_change", player=self.name, suit=self.table.change_of_suit)
+            elif effect == WAIT:
+                self.table.has_to_wait = True
+            elif effect == REVERSE and self.game is not None:
+                self.game.reverse_direction()
 
             self.hand.remove(card)
             self.played_card = True
             return card
         return None
 
+    def choose_cards(self, playable_cards, current_card):
+        """
+        Chooses what to play when the player is free to play any of the playable cards:
+        all playable cards of the most common rank
+        :param playable_cards: Playable cards, in hand order
+        :param current_card: Card on top of discard pile
+        :return: List of cards to play, the last one ends on top of discard pile
+        """
+        rank_count = [0] * len(RANKS)
+        for card in playable_cards:
+            rank_count[card.rank_id] += 1
+        most_common = max(playable_cards, key=lambda card: rank_count[card.rank_id]).rank_id
+        return [card for card in playable_cards if card.rank_id == most_common]
+
+    def choose_response(self, playable_cards, current_card):
+        """
+        Chooses what to play in answer to a pending penalty, block or demand: the first playable card
+        :param playable_cards: Playable cards, in hand order
+        :param current_card: Card on top of discard pile
+        :return: List of cards to play, the last one ends on top of discard pile
+        """
+        return [playable_cards[0]]
+
     def logic(self, deck, current_card):
         """
         Main logic of player's move. Establishes which card to play based on which card is first on discard pile.
@@ -211,82 +737,81 @@ class Player:
         :return: Card to be played using given logic
         """
         self.has_drawn = False
-        self.order_hand()
-        print(self.show_hand())
         first_card = deck.first_card()
         if self.waiting == 0:
+            rules = self.table.rules
+            effect = rules.effect[current_card.code]
             playable_cards = self.show_playable_cards(current_card)
-            rank_count = self.count_card_ranks(playable_cards)
-            if ((current_card.rank == '2' or current_card.rank == '3' or
-                 (current_card.rank == 'K' and (current_card.suit == "Spades" or current_card.suit == "Hearts")))
-                    and Player.has_to_draw):
+            if effect == PENALTY_DRAW and self.table.has_to_draw:
                 if len(playable_cards) != 0:
-                    return self.play_card([playable_cards[0]])
-                if current_card.rank == '2':
-                    if first_card.rank == '2' or (first_card.rank == '3' and first_card.suit == current_card.suit):
-                        return self.play_card([self.draw(deck)[0]])
-                if current_card.rank == '3':
-                    if first_card.rank == '3' or (first_card.rank == '2' and first_card.suit == current_card.suit):
-                        return self.play_card([self.draw(deck)[0]])
-                if current_card.rank == 'K':
-                    if first_card.rank == 'K' and (current_card.suit == "Spades" or current_card.suit == "Hearts"):
-                        return self.play_card([self.draw(deck)[0]])
+                    return self.play_card(self.choose_response(playable_cards, current_card))
+                # Karta z wierzchu talii, która odpowiada na karę, jest dobierana i od razu zagrywana
+                if first_card is not None and rules.penalty_peek[current_card.code] >> first_card.code & 1:
+                    return self.play_card(self.draw(deck))
                 if len(playable_cards) == 0:
-                    Player.has_to_draw = False
-                    self.draw(deck, Player.how_many_to_draw)
+                    self.table.has_to_draw = False
+                    self.draw(deck, self.table.how_many_to_draw)
                     self.played_card = False
-                    print(f"Dobrano {Player.how_many_to_draw}")
+                    if self.metrics.enabled:
+                        self.metrics.count("penalty_draws", card=current_card.rank)
+                        self.metrics.count("penalty_cards", self.table.how_many_to_draw, card=current_card.rank)
+                    if self.log.level:
+                        self.log.emit("penalty_draw", player=self.name, cards=self.table.how_many_to_draw,
+                                      card=current_card.name)
                     self.set_how_many_to_draw(0)
                     return current_card
-            elif current_card.rank == '4' and Player.has_to_wait:
+            elif effect == WAIT and self.table.has_to_wait:
                 if len(playable_cards) != 0:
-                    return self.play_card([playable_cards[0]])
+                    return self.play_card(self.choose_response(playable_cards, current_card))
                 else:
-                    Player.has_to_wait = False
+                    self.table.has_to_wait = False
                     self.played_card = False
+                    if self.metrics.enabled:
+                        self.metrics.count("blocked_turns")
                     return current_card
-            elif Player.demand is not None:
-                Player.drawn_countJ += 1
-                if Player.drawn_countJ > Player.id - 1:
-                    Player.drawn_countJ = 0
-                    Player.demand = None
-                    Player.has_to_draw = False
+            elif self.table.demand is not None:
+                self.table.drawn_countJ += 1
+                if self.table.drawn_countJ > self.table.players_count:
+                    self.table.drawn_countJ = 0
+                    self.table.demand = None
+                    self.table.has_to_draw = False
+                    if self.metrics.enabled:
+                        self.metrics.count("demand_cycles")
                 if len(playable_cards) != 0:
-                    return self.play_card([playable_cards[0]])
+                    return self.play_card(self.choose_response(playable_cards, current_card))
                 else:
                     self.draw(deck)
                     self.played_card = False
                     return current_card
             if len(playable_cards) != 0:
-                card_to_play = playable_cards[0]
-                if rank_count is not None:
-                    most_common = max(rank_count, key=rank_count.get)
-                    card_to_play = [c for c in playable_cards if c.rank == most_common]
-                if Player.change_of_suit is not None and current_card.rank == 'A':
-                    Player.change_of_suit = None
+                card_to_play = self.choose_cards(playable_cards, current_card)
+                if self.table.change_of_suit is not None and effect == SUIT_CHANGE:
+                    self.table.change_of_suit = None
                 return self.play_card(card_to_play)
             else:
-                card = self.draw(deck)[0]
-                if card.rank == current_card.rank or card.suit == current_card.suit:
-                    return self.play_card([card])
+                drawn = self.draw(deck)
+                if drawn and (drawn[0].rank_id == current_card.rank_id or drawn[0].suit_id == current_card.suit_id):
+                    return self.play_card(drawn)
                 else:
                     self.played_card = False
                     return current_card
         else:
             self.waiting -= 1
             self.played_card = False
+            if self.metrics.enabled:
+                self.metrics.count("blocked_turns")
             return current_card
 
     def show_hand(self):
-        return ", ".join(str(card) for card in self.hand)
+        return str(self.hand)
 
     def __str__(self):
         return f"Player id: {self.player_id}, name: {self.name}"
 
 
 class MainPlayer(Player):
-    def __init__(self, name):
-        super().__init__(name)
+    def __init__(self, name, player_id=1, table=None):
+        super().__init__(name, player_id, table)
         self.played = False
         self.can_play = False
         self.my_turn = False
@@ -295,7 +820,7 @@ class MainPlayer(Player):
         self.can_play = can
 
     def show_hand(self):
-        return "Twoja ręka: " + ", ".join(str(card) for card in self.hand)
+        return "Twoja ręka: " + str(self.hand)
 
     def play_card(self, cards):
         for i in range(len(cards) - 1):
@@ -312,19 +837,114 @@ class MainPlayer(Player):
         return current_card
 
 
+class RemotePlayer(Player):
+    """
+    Player whose choices come from outside the game, e.g. from a client of the game server.
+    Before the turn the controller checks decision_cards and sets `move`; forced parts of the turn
+    (penalties, blocks, draws) follow the same rules as Player, and without a move Player's choice is used.
+    """
+
+    def __init__(self, name, player_id=1, table=None):
+        super().__init__(name, player_id, table)
+        self.move = None
+
+    def decision_cards(self, current_card):
+        """
+        Returns cards the player may choose from in the coming turn
+        :param current_card: Card on top of discard pile
+        :return: Playable cards, empty if the turn leaves no choice
+        """
+        if self.waiting:
+            return []
+        return self.show_playable_cards(current_card)
+
+    @staticmethod
+    def legal_move(codes, playable_cards, response=False):
+        """
+        Checks a move requested from outside: one or more playable cards of the same rank, a card appearing
+        at most as many times as the player holds it, or a single card if the move is a response
+        :param codes: Card codes in play order, the last one ends on top of discard pile
+        :param playable_cards: Cards returned by decision_cards
+        :param response: Result of is_response for the card on top of discard pile
+        :return: List of cards to play or None if the move is not allowed
+        """
+        if not isinstance(codes, list) or not codes or not all(type(code) is int for code in codes):
+            return None
+        if response:
+            return [CARDS[codes[0]]] if tuple(codes) in candidate_moves(playable_cards, True) else None
+        copies = {}
+        for card in playable_cards:
+            copies[card.code] = copies.get(card.code, 0) + 1
+        cards = []
+        for code in codes:
+            if not copies.get(code):
+                return None
+            copies[code] -= 1
+            cards.append(CARDS[code])
+        if len({card.rank_id for card in cards}) != 1:
+            return None
+        return cards
+
+    def _take_move(self):
+        move, self.move = self.move, None
+        return move
+
+    def choose_cards(self, playable_cards, current_card):
+        return self._take_move() or super().choose_cards(playable_cards, current_card)
+
+    def choose_response(self, playable_cards, current_card):
+        return self._take_move() or super().choose_response(playable_cards, current_card)
+
+
+def max_players(decks=1):
+    """
+    :return: Largest number of players that can be dealt HAND_SIZE cards with a card left for the discard pile
+    """
+    return (decks * DECK_SIZE - 1) // HAND_SIZE
+
+
 class MakaoGame:
-    def __init__(self, players, main_player_name):
-        self.deck = CardDeck()
-        self.players = MakaoGame.initialize_players(players, main_player_name)
-        self.discard_pile = []
+    def __init__(self, players, main_player_name=None, log=None, seed=None, player_types=None, metrics=None,
+                 rules=None, decks=1):
+        """
+        :param players: Names of computer players
+        :param main_player_name: Name of the human player or None for a table of computer players only
+        :param log: EventLog receiving game events, silent by default
+        :param seed: Seed of the game's own random generator; the same seed and players give the same game
+        :param player_types: Player class for every computer player, Player by default
+        :param metrics: Metrics collecting counters and phase timings, disabled by default
+        :param rules: RuleSet of the game, STANDARD_RULES by default
+        :param decks: Number of combined 52-card decks; a table needs more cards than it deals
+        """
+        seats = len(players) + (main_player_name is not None)
+        if seats > max_players(decks):
+            raise ValueError(f"{seats} players need more than {decks} deck(s)")
+        self.log = log if log is not None else NULL_LOG
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.deck = CardDeck(self.rng, decks)
+        self.deck.metrics = self.metrics
+        self.table = TableState(rules=rules)
+        self.players = MakaoGame.initialize_players(players, main_player_name, self.table, player_types)
+        self.table.players_count = len(self.players)
+        for player in self.players:
+            player.log = self.log
+            player.metrics = self.metrics
+            player.game = self
         self.current_player_index = 0
         self.current_player = self.players[self.current_player_index]
         self.direction = 1  # 1 oznacza zgodnie z ruchem wskazówek zegara, -1 przeciwnie
 
     @staticmethod
-    def initialize_players(players_data, main_player_name):
-        players = [Player(name) for name in players_data]
-        players.append(MainPlayer(main_player_name))
+    def initialize_players(players_data, main_player_name, table, player_types=None):
+        if player_types is None:
+            player_types = [Player] * len(players_data)
+        players = [player_type(name, idx + 1, table)
+                   for idx, (name, player_type) in enumerate(zip(players_data, player_types))]
+        # Bez nazwy gracza głównego przy stole siedzą same komputery
+        if main_player_name is not None:
+            players.append(MainPlayer(main_player_name, len(players) + 1, table))
         return players
 
     def prepare_game(self):
@@ -333,51 +953,116 @@ class MakaoGame:
         """
 
         # Każdy gracz dobiera na początek 5 kart
-        for i in range(5):
+        for i in range(HAND_SIZE):
             for player in self.players:
                 player.draw(self.deck)
 
-        # Pierwsza karta na stosie kart odrzuconych
+        # Pierwsza karta na stosie kart odrzuconych; przy wielu graczach w talii mogą zostać same karty funkcyjne
+        functional = self.table.rules.functional
+        deck = self.deck
+        any_plain = any(not functional[code] for code in deck.buffer[deck.draw_pos:])
         first_card = self.deck.draw_card()
-        while first_card.is_functional_card():
-            self.deck.cards.append(first_card)
+        while any_plain and functional[first_card.code]:
+            self.deck.put_card(first_card)
             self.deck.shuffle()
             first_card = self.deck.draw_card()
-        self.discard_pile.append(first_card)
-        print(f"Pierwsza karta na stosie odrzuconych: {first_card}")
+        self.deck.discard(first_card)
+        if self.log.level:
+            self.log.emit("game_start", players=[player.name for player in self.players], first_card=first_card.name)
+            if self.log.level >= VERBOSE:
+                self.log.emit("deck", cards=str(self.deck).split(", "))
 
     def play_turn(self):
         """
         Simulates making a move by a player
         """
-        current_card = self.discard_pile[-1]
-        print(f"\nTura {self.current_player}. Obecna ręka: {self.current_player.show_hand()}")
-        for i in self.current_player.show_playable_cards(current_card):
-            print(i, end=" ")
-        print()
-
-        print(f"Current card: {current_card}")
-
-        if self.deck.cards_left() <= Player.how_many_to_draw + 1:
-            print(self.discard_pile[:-1])
-            self.deck.create_deck_from_discard_pile(self.discard_pile[:-1])
-            self.discard_pile = [self.discard_pile[-1]]
-            print("Utworzono nową talię")
-            print(f"Nowa talia: {self.deck}")
-            print(f"Karta na stosie odrzuconych: {self.discard_pile[-1]}")
-        current_card = self.discard_pile[-1]
-
-        x = self.current_player.logic(self.deck, current_card)
-        if x != current_card:
-            self.discard_pile.append(x)
-
-        print(f"Dodaję kartę: {x}")
-        if self.current_player.played_card:
-            print(f"{self.current_player.name} zagrał {x}")
+        player = self.current_player
+        log = self.log
+        metrics = self.metrics
+        if metrics.enabled:
+            start = perf_counter()
+        deck = self.deck
+        current_card = deck.top_card()
+        if log.level >= VERBOSE:
+            log.emit("hand", player=str(player), hand=[card.name for card in player.hand],
+                     playable=[card.name for card in player.show_playable_cards(current_card)], top=current_card.name)
+
+        reshuffles = deck.reshuffles
+        player.cards_drawn = 0
+        player.cards_played = ()
+        if metrics.enabled:
+            logic_start = perf_counter()
+            player.logic(deck, current_card)
+            metrics.observe("logic", perf_counter() - logic_start)
         else:
-            print(f"{self.current_player.name} nie mógł zagrać")
+            player.logic(deck, current_card)
+        # Przy kilku taliach zagrana karta może być kopią karty z wierzchu, więc o zagraniu świadczy cards_played
+        for card in player.cards_played:
+            deck.discard(card)
+        if log.level and deck.reshuffles != reshuffles:
+            log.emit("reshuffle", cards=deck.cards_left(), top=current_card.name)
+
+        if log.level:
+            table = self.table
+            log.emit("turn", seat=player.player_id, player=player.name, top=current_card.name,
+                     played=[card.name for card in player.cards_played] if player.played_card else [],
+                     drawn=player.cards_drawn, hand=len(player.hand), demand=table.demand,
+                     change_of_suit=table.change_of_suit, to_draw=table.how_many_to_draw,
+                     wait=table.has_to_wait)
+            if not player.hand:
+                log.emit("win", seat=player.player_id, player=player.name)
+        if metrics.enabled:
+            metrics.count("turns")
+            metrics.observe("turn", perf_counter() - start)
+
+    def top_card(self):
+        """
+        :return: Card on top of the discard pile
+        """
+        return self.deck.top_card()
+
+    def clone(self, player_types=None, rng=None):
+        """
+        Fast copy of the game state (both piles, hands, pending effects, current player), e.g. for
+        search. The copy has no log and no metrics
+        :param player_types: Player class for every seat of the copy, the same as in this game by default
+        :param rng: Random generator of the copy, a new unseeded one by default
+        :return: New MakaoGame
+        """
+        game = MakaoGame.__new__(MakaoGame)
+        game.log = NULL_LOG
+        game.metrics = NULL_METRICS
+        game.seed = None
+        game.rng = rng if rng is not None else random.Random()
+        game.deck = self.deck.copy(game.rng)
+        game.table = self.table.copy()
+        if player_types is None:
+            player_types = [type(player) for player in self.players]
+        game.players = [player.copy(game.table, player_type)
+                        for player, player_type in zip(self.players, player_types)]
+        for player in game.players:
+            player.game = game
+        game.current_player_index = self.current_player_index
+        game.current_player = game.players[self.current_player_index]
+        game.direction = self.direction
+        return game
+
+    def next_player(self):
+        """
+        Passes the turn to the next player at the table in the current direction of play
+        :return: Player whose turn it is now
+        """
+        self.current_player_index = (self.current_player_index + self.direction) % len(self.players)
+        self.current_player = self.players[self.current_player_index]
+        return self.current_player
+
+    def reverse_direction(self):
+        """
+        Reverses the direction of play; the next turn goes to the player who played before the current one
+        """
+        self.direction = -self.direction
+        if self.log.level:
+            self.log.emit("reverse", direction=self.direction)
 
-        if not self.current_player.hand:
-            print(f"{self.current_player.name} wygrał!")
-        if not self.deck.cards:
-            self.deck = CardDeck()
+    def is_over(self):
+        return not self.current_player.hand
@@ -1,11 +1,15 @@
+import queue
+import threading
 import tkinter as tk
-from game import Player
+
+from game import CARDS
 
 
 class DemandDialog(tk.Toplevel):
-    def __init__(self, parent):
+    def __init__(self, parent, table):
         super().__init__(parent)
         self.parent = parent
+        self.table = table
         self.title("Demand")
 
         self.geometry("500x200")
@@ -30,7 +34,8 @@ class DemandDialog(tk.Toplevel):
         frame = tk.Frame(self, bg='lightblue')
         frame.pack(pady=10)
 
-        options = ["5", "6", "7", "8", "9", "10", None]
+        # Do wyboru są rangi, których można żądać według zasad gry
+        options = [*table.rules.demandable_ranks, None]
 
         for idx, option in enumerate(options):
             if option is None:
@@ -43,14 +48,15 @@ class DemandDialog(tk.Toplevel):
 
     def choose_option(self, option):
         if option != "pass":
-            Player.demand = option
+            self.table.demand = option
         self.destroy()
 
 
 class SuitChangeDialog(tk.Toplevel):
-    def __init__(self, parent):
+    def __init__(self, parent, table):
         super().__init__(parent)
         self.parent = parent
+        self.table = table
         self.title("Change of suit")
 
         self.geometry("500x150")
@@ -81,5 +87,121 @@ class SuitChangeDialog(tk.Toplevel):
             btn.grid(row=0, column=idx, padx=5, pady=5)
 
     def choose_option(self, option):
-        Player.change_of_suit = option
+        self.table.change_of_suit = option
         self.destroy()
+
+
+class CardImageCache:
+    """
+    Card images keyed by (card code, scale). Every image is decoded and scaled once, on first use or in the
+    background between Tk events, and the same PhotoImage is returned on every later redraw.
+    """
+    suit_letters = {'Spades': 'p', 'Diamonds': 'd', 'Hearts': 's', 'Clubs': 't'}
+
+    def __init__(self, root, directory="cards"):
+        """
+        :param root: Tk window whose event loop runs background loading
+        :param directory: Directory with card PNGs
+        """
+        self.root = root
+        self.directory = directory
+        self.images = {}
+        self.pending = []
+
+    def get(self, card, scale=1):
+        """
+        Returns the image of a card, loading and scaling it if it is not in the cache yet
+        :param card: Card to show
+        :param scale: Subsample factor, e.g. 4 for a quarter of the original size
+        :return: PhotoImage or None if the card has no image
+        """
+        key = (card.code, scale)
+        if key in self.images:
+            return self.images[key]
+        image = self._load(card) if scale == 1 else self.get(card, 1)
+        if image is not None and scale != 1:
+            image = image.subsample(scale)
+        self.images[key] = image
+        return image
+
+    def _load(self, card):
+        image_path = f"{self.directory}/{self.suit_letters[card.suit]}{card.rank.lower()}.png"
+        try:
+            return tk.PhotoImage(file=image_path)
+        except Exception as e:
+            print(f"Error loading image {image_path}: {e}")
+            return None
+
+    def preload(self, scales=(1,), cards_per_step=2):
+        """
+        Fills the cache for all cards in idle time, a few cards per step, so the window is shown before
+        all images are decoded
+        :param scales: Scales to prepare for every card
+        :param cards_per_step: Cards loaded in one idle callback
+        """
+        self.pending = [(card, scale) for card in CARDS for scale in scales]
+        self.pending.reverse()
+        self.root.after_idle(self._preload_step, cards_per_step * len(scales))
+
+    def _preload_step(self, count):
+        for _ in range(min(count, len(self.pending))):
+            self.get(*self.pending.pop())
+        if self.pending:
+            # Kolejny krok trafia do następnej fazy bezczynności, po zdarzeniach okna
+            self.root.after_idle(self._preload_step, count)
+
+
+class TurnWorker:
+    """
+    One background thread running long game computations, e.g. computer turns. The thread never touches Tk:
+    results are put on a queue which the Tk loop polls with after() and callbacks run in the Tk loop.
+    """
+
+    def __init__(self, root, poll_interval=20):
+        """
+        :param root: Tk window whose event loop runs callbacks
+        :param poll_interval: Milliseconds between checks of the result queue while a job is running
+        """
+        self.root = root
+        self.poll_interval = poll_interval
+        self.jobs = queue.Queue()
+        self.results = queue.Queue()
+        self.pending = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            func, callback = job
+            try:
+                self.results.put((callback, func(), None))
+            except Exception as e:
+                self.results.put((callback, None, e))
+
+    def submit(self, func, callback):
+        """
+        Runs func on the worker thread and then callback(result) in the Tk loop
+        """
+        self.pending += 1
+        self.jobs.put((func, callback))
+        if self.pending == 1:
+            self.root.after(self.poll_interval, self._poll)
+
+    def _poll(self):
+        while True:
+            try:
+                callback, result, error = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self.pending -= 1
+            if error is not None:
+                raise error
+            callback(result)
+        if self.pending:
+            self.root.after(self.poll_interval, self._poll)
+
+    def close(self):
+        self.jobs.put(None)
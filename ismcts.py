@@ -0,0 +1,259 @@
+import math
+import random
+import time
+from multiprocessing import Pool
+
+import checkpoint
+from game import CARDS, DECK_SIZE, PENALTY_DRAW, WAIT, Hand, Player, candidate_moves
+
+_pool = None
+_pool_size = 0
+
+
+def _get_pool(workers):
+    """
+    Returns a process pool shared by all search players of this process, created on first use
+    """
+    global _pool, _pool_size
+    if _pool is None or _pool_size != workers:
+        if _pool is not None:
+            _pool.terminate()
+        _pool = Pool(workers)
+        _pool_size = workers
+    return _pool
+
+
+class _Node:
+    """
+    Information set in the search tree, reached by a move of the player at seat
+    """
+    __slots__ = ('seat', 'visits', 'value', 'available', 'children')
+
+    def __init__(self, seat):
+        self.seat = seat
+        self.visits = 0
+        self.value = 0.0
+        # Ile razy ruch prowadzący do węzła był legalny; przy determinizacjach zastępuje liczbę odwiedzin rodzica
+        self.available = 0
+        self.children = {}
+
+
+class _Descent:
+    """
+    One iteration of the search: walks down the tree through the decisions of every player of a determinized
+    game and expands the first move not in the tree, after which the players play greedily
+    """
+
+    def __init__(self, root, rng, exploration):
+        self.node = root
+        self.path = []
+        self.rng = rng
+        self.exploration = exploration
+
+    def choose(self, seat, moves):
+        """
+        :param seat: Seat of the deciding player
+        :param moves: Legal moves of the decision, as from candidate_moves
+        :return: Move from the tree or None when the playout has left the tree
+        """
+        node = self.node
+        if len(moves) == 1:
+            return None
+        children = node.children
+        unexplored = []
+        for move in moves:
+            child = children.get(move)
+            if child is None:
+                unexplored.append(move)
+            else:
+                child.available += 1
+        if unexplored:
+            move = self.rng.choice(unexplored)
+            child = children[move] = _Node(seat)
+            child.available = 1
+            self.node = None
+        else:
+            exploration = self.exploration
+            move = max(moves, key=lambda move: children[move].value / children[move].visits +
+                       exploration * math.sqrt(math.log(children[move].available) / children[move].visits))
+            child = self.node = children[move]
+        self.path.append(child)
+        return move
+
+    def update(self, rewards):
+        for node in self.path:
+            node.visits += 1
+            node.value += rewards[node.seat]
+
+
+class _RolloutPlayer(Player):
+    """
+    Player of a determinized game: takes its decisions from the search tree while the iteration is inside it,
+    then plays as Player would
+    """
+    descent = None
+
+    def choose_cards(self, playable_cards, current_card):
+        if self.descent.node is not None:
+            move = self.descent.choose(self.game.current_player_index, candidate_moves(playable_cards))
+            if move is not None:
+                return [CARDS[code] for code in move]
+        return super().choose_cards(playable_cards, current_card)
+
+    def choose_response(self, playable_cards, current_card):
+        if self.descent.node is not None:
+            move = self.descent.choose(self.game.current_player_index, candidate_moves(playable_cards, True))
+            if move is not None:
+                return [CARDS[move[0]]]
+        return super().choose_response(playable_cards, current_card)
+
+
+def _determinize(game, seat, rng):
+    """
+    Replaces hidden information in a copy of the game with a random guess consistent with what the player
+    at seat has seen: own hand and the discard pile are kept, opponents' hands keep their sizes and the deck
+    keeps its size
+    """
+    # Liczba niewidzianych kopii każdej karty; przy kilku taliach karta może być jednocześnie widziana i ukryta
+    copies = [len(game.deck.buffer) // DECK_SIZE] * DECK_SIZE
+    for code in game.players[seat].hand.codes:
+        copies[code] -= 1
+    for code in game.deck.discarded_codes():
+        copies[code] -= 1
+    unseen = [code for code in range(DECK_SIZE) for _ in range(copies[code])]
+    rng.shuffle(unseen)
+    for idx, player in enumerate(game.players):
+        if idx != seat:
+            size = len(player.hand)
+            player.hand = Hand(CARDS[code] for code in unseen[:size])
+            del unseen[:size]
+    game.deck.arrange(game.deck.discarded_codes(), unseen)
+
+
+def _playout(game, max_turns):
+    """
+    Plays the game to the end
+    :return: Reward of every seat: 1 for the winner and 0 for the others, a share by hand sizes if the turn limit
+             is reached
+    """
+    for _ in range(max_turns):
+        game.play_turn()
+        if game.is_over():
+            return [1.0 if idx == game.current_player_index else 0.0 for idx in range(len(game.players))]
+        game.next_player()
+    sizes = [len(player.hand) for player in game.players]
+    rewards = []
+    for idx, own in enumerate(sizes):
+        best_other = min(size for other, size in enumerate(sizes) if other != idx)
+        rewards.append(best_other / (own + best_other) if own + best_other else 0.5)
+    return rewards
+
+
+def search(root, seat, moves, iterations, time_limit, seed, exploration=0.7, max_turns=200):
+    """
+    Single-observer information-set MCTS: every iteration samples a determinization of the cards hidden from
+    the player at seat, descends one tree shared by all determinizations through the decisions of every player
+    (free moves and answers to penalties, blocks and demands), choosing among the moves legal in that
+    determinization by UCB1 with availability counts, expands one node and finishes the game with greedy players
+    :param root: Copy of the game with _RolloutPlayer at every seat, at the start of the turn of the player at seat
+    :param moves: Candidate moves of the coming decision as tuples of card codes
+    :param iterations: Maximum number of iterations
+    :param time_limit: Maximum search time in seconds or None
+    :param seed: Seed of the search
+    :return: List of (visits, total value) for every move
+    """
+    rng = random.Random(seed)
+    tree = _Node(seat)
+    deadline = time.monotonic() + time_limit if time_limit is not None else None
+    for _ in range(iterations):
+        if deadline is not None and time.monotonic() > deadline:
+            break
+        game = root.clone(rng=random.Random(rng.getrandbits(64)))
+        _determinize(game, seat, rng)
+        descent = _Descent(tree, rng, exploration)
+        for player in game.players:
+            player.descent = descent
+        descent.update(_playout(game, max_turns))
+    children = tree.children
+    return [(children[move].visits, children[move].value) if move in children else (0, 0.0) for move in moves]
+
+
+def _search_task(task):
+    data, players_count, rules, *args = task
+    return search(checkpoint.loads(data, [_RolloutPlayer] * players_count, rules=rules), *args)
+
+
+class ISMCTSPlayer(Player):
+    """
+    Computer player choosing its free moves and its answers to penalties, blocks and demands by information-set
+    Monte Carlo tree search over determinizations. Turns without a choice follow the same rules as Player.
+    """
+
+    def __init__(self, name, player_id=1, table=None, rollouts=400, time_limit=None, workers=0,
+                 exploration=0.7, max_rollout_turns=200):
+        """
+        :param rollouts: Rollout budget of one decision
+        :param time_limit: Time budget of one decision in seconds, None for no limit
+        :param workers: Number of worker processes running rollouts in parallel, 0 to search in this process
+        :param exploration: UCB1 exploration constant
+        :param max_rollout_turns: Turn limit of a single rollout
+        """
+        super().__init__(name, player_id, table)
+        self.rollouts = rollouts
+        self.time_limit = time_limit
+        self.workers = workers
+        self.exploration = exploration
+        self.max_rollout_turns = max_rollout_turns
+
+    def copy(self, table, player_type=None):
+        player = super().copy(table, player_type)
+        if isinstance(player, ISMCTSPlayer):
+            player.rollouts = self.rollouts
+            player.time_limit = self.time_limit
+            player.workers = self.workers
+            player.exploration = self.exploration
+            player.max_rollout_turns = self.max_rollout_turns
+        return player
+
+    def choose_cards(self, playable_cards, current_card):
+        return (self._search(candidate_moves(playable_cards), current_card) or
+                super().choose_cards(playable_cards, current_card))
+
+    def choose_response(self, playable_cards, current_card):
+        # Żądanie wygasłe w tej turze nie jest już odpowiedzią, której stan da się odtworzyć od początku tury
+        if not self.is_response(current_card):
+            return super().choose_response(playable_cards, current_card)
+        return (self._search(candidate_moves(playable_cards, True), current_card) or
+                super().choose_response(playable_cards, current_card))
+
+    def _search(self, moves, current_card):
+        """
+        :param moves: Candidate moves of the decision
+        :return: Cards of the best move or None if there is nothing to search
+        """
+        if len(moves) == 1 or self.game is None:
+            return None
+        seat = self.game.current_player_index
+        root = self.game.clone(player_types=[_RolloutPlayer] * len(self.game.players))
+        # Przeszukiwanie zaczyna turę od nowa, więc cofany jest licznik żądania zwiększony już w logic
+        effect = self.table.rules.effect[current_card.code]
+        if (self.table.demand is not None and not (effect == PENALTY_DRAW and self.table.has_to_draw) and
+                not (effect == WAIT and self.table.has_to_wait)):
+            root.table.drawn_countJ -= 1
+        seed = self.game.rng.getrandbits(64)
+        args = (seat, moves, self.rollouts, self.time_limit, seed, self.exploration, self.max_rollout_turns)
+        if self.workers:
+            per_worker = -(-self.rollouts // self.workers)
+            # Pozycja trafia do procesów jako zwarty zapis stanu zamiast zapiklowanych obiektów gry
+            data = checkpoint.dumps(root, with_rng=False)
+            tasks = [(data, len(root.players), root.table.rules, seat, moves, per_worker, self.time_limit,
+                      seed + idx, self.exploration, self.max_rollout_turns) for idx in range(self.workers)]
+            stats = [[0, 0.0] for _ in moves]
+            for result in _get_pool(self.workers).map(_search_task, tasks):
+                for total, (visits, value) in zip(stats, result):
+                    total[0] += visits
+                    total[1] += value
+        else:
+            stats = search(root, *args)
+        best = max(range(len(moves)), key=lambda idx: (stats[idx][0], stats[idx][1]))
+        return [CARDS[code] for code in moves[best]]
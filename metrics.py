@@ -0,0 +1,96 @@
+import json
+from collections import defaultdict
+
+PREFIX = "makao"
+
+
+class Metrics:
+    """
+    Counters and phase timers of game runs. Code updating them checks `metrics.enabled` first, so disabled
+    metrics cost a single attribute test, like a silent EventLog.
+
+    Phases are nested: "turn" (MakaoGame.play_turn) contains "logic" (Player.logic), which contains "draw"
+    (Player.draw), which contains "recycle" (moving the discard pile under the deck).
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        # Klucz licznika to (nazwa, krotka par etykieta-wartość)
+        self.counters = defaultdict(int)
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+
+    def count(self, name, value=1, **labels):
+        """
+        Adds to a counter
+        :param name: Counter name, e.g. "penalty_draws"
+        :param value: Amount to add
+        :param labels: Labels of the counter, e.g. card="K"
+        """
+        self.counters[name, tuple(labels.items())] += value
+
+    def observe(self, phase, seconds):
+        """
+        Adds time spent in one call of a phase
+        """
+        self.seconds[phase] += seconds
+        self.calls[phase] += 1
+
+    def snapshot(self):
+        """
+        :return: Plain dictionary of all values, e.g. to send from a worker process or write as JSON
+        """
+        return {
+            "counters": [{"name": name, "labels": dict(labels), "value": value}
+                         for (name, labels), value in sorted(self.counters.items())],
+            "phases": {phase: {"calls": self.calls[phase], "seconds": self.seconds[phase]}
+                       for phase in sorted(self.seconds)},
+        }
+
+    def merge(self, snapshot):
+        """
+        Adds values from a snapshot, e.g. one taken in a worker process
+        """
+        for counter in snapshot["counters"]:
+            self.counters[counter["name"], tuple(counter["labels"].items())] += counter["value"]
+        for phase, values in snapshot["phases"].items():
+            self.seconds[phase] += values["seconds"]
+            self.calls[phase] += values["calls"]
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self):
+        """
+        :return: All values in the Prometheus text exposition format
+        """
+        lines = []
+        last_name = None
+        for (name, labels), value in sorted(self.counters.items()):
+            metric = f"{PREFIX}_{name}_total"
+            if name != last_name:
+                lines.append(f"# TYPE {metric} counter")
+                last_name = name
+            lines.append(f"{metric}{_labels(labels)} {value}")
+        for metric, values in (("phase_seconds", self.seconds), ("phase_calls", self.calls)):
+            lines.append(f"# TYPE {PREFIX}_{metric}_total counter")
+            for phase in sorted(values):
+                lines.append(f"{PREFIX}_{metric}_total{_labels((('phase', phase),))} {values[phase]}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        """
+        Writes all values to a file, in the Prometheus text format for a .prom file and as JSON otherwise
+        """
+        with open(path, "w") as file:
+            file.write(self.to_prometheus() if path.endswith(".prom") else self.to_json())
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"') for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+
+NULL_METRICS = Metrics(enabled=False)
@@ -0,0 +1,246 @@
+import argparse
+import bisect
+import json
+import mmap
+import struct
+
+import checkpoint
+from game import CARDS, Hand, rules_from_definition
+
+MAGIC = b"MKR"
+VERSION = 1
+NONE = checkpoint.NONE
+# Co ile tur zapisywany jest pełny stan gry
+SNAPSHOT_EVERY = 64
+
+# Rodzaje rekordów
+SNAPSHOT = 1
+TURN = 2
+INDEX = 3
+
+# magic, wersja, co ile tur migawka, długość definicji zasad (JSON zaraz po nagłówku)
+_HEADER = struct.Struct("<3sBHI")
+# rodzaj rekordu, długość danych
+_RECORD = struct.Struct("<BI")
+# numer tury migawki, po nim zapis checkpoint.dumps z generatorem liczb losowych
+_SNAPSHOT = struct.Struct("<I")
+# gracz, kierunek gry, flagi gracza, waiting, ostatnio zagrana karta, cards_drawn, wielkość stosu odrzuconych,
+# pozycja wierzchu talii, liczba przetasowań, liczba kart w ręce, liczba dorzuconych kart stosu (lub całego bufora)
+_TURN = struct.Struct("<BbBBBHHHIHH")
+# numer tury migawki i jej położenie w pliku
+_INDEX_ENTRY = struct.Struct("<IQ")
+# położenie rekordu indeksu, liczba migawek, liczba tur, znacznik końca
+_FOOTER = struct.Struct("<QII4s")
+FOOTER_MAGIC = b"MKRX"
+
+
+class ReplayWriter:
+    """
+    Append-only binary log of one game: a header with the rules, one record per turn holding what the turn
+    changed (the hand of the player, pending effects and the new cards of the discard pile, or the whole deck
+    after a reshuffle), a full checkpoint every snapshot_every turns and, when the game ends, an index of
+    snapshot offsets. Records are written as the game goes, so a log cut short is readable up to its last
+    complete record.
+
+    Turns played through MakaoGame.play_turn are recorded exactly; moves the GUI makes outside play_turn are not.
+    """
+
+    def __init__(self, stream, snapshot_every=SNAPSHOT_EVERY):
+        """
+        :param stream: Binary stream at the start of an empty file
+        :param snapshot_every: Number of turns between snapshots
+        """
+        self.stream = stream
+        self.snapshot_every = snapshot_every
+        self.offset = 0
+        self.turns = 0
+        self.snapshots = []
+        self._discard_size = 0
+        self._reshuffles = 0
+
+    def start(self, game):
+        """
+        Writes the header and the snapshot of turn 0
+        :param game: Game after prepare_game
+        """
+        rules = json.dumps(game.table.rules.definition).encode()
+        self._write(_HEADER.pack(MAGIC, VERSION, self.snapshot_every, len(rules)) + rules)
+        self._snapshot(game)
+
+    def record_turn(self, game):
+        """
+        Appends the turn just played by the current player; call after play_turn and before next_player
+        """
+        self.turns += 1
+        deck = game.deck
+        player = game.current_player
+        if deck.reshuffles != self._reshuffles:
+            cards = bytes(deck.buffer)
+        else:
+            cards = bytes(deck.buffer[self._discard_size:deck.discard_size])
+        hand = player.hand.codes
+        payload = b"".join((
+            _TURN.pack(game.current_player_index, game.direction, checkpoint.player_flags(player), player.waiting,
+                       player.last_card_played.code if player.last_card_played is not None else NONE,
+                       player.cards_drawn, deck.discard_size, deck.draw_pos, deck.reshuffles, len(hand), len(cards)),
+            checkpoint.pack_table(game.table),
+            hand,
+            cards,
+        ))
+        self._write(_RECORD.pack(TURN, len(payload)) + payload)
+        self._discard_size = deck.discard_size
+        self._reshuffles = deck.reshuffles
+        if self.turns % self.snapshot_every == 0:
+            self._snapshot(game)
+
+    def close(self):
+        """
+        Writes the index of snapshots; the stream itself is left open
+        """
+        index_offset = self.offset
+        entries = b"".join(_INDEX_ENTRY.pack(turn, offset) for turn, offset in self.snapshots)
+        self._write(_RECORD.pack(INDEX, len(entries)) + entries)
+        self._write(_FOOTER.pack(index_offset, len(self.snapshots), self.turns, FOOTER_MAGIC))
+        self.stream.flush()
+
+    def _snapshot(self, game):
+        self.snapshots.append((self.turns, self.offset))
+        payload = _SNAPSHOT.pack(self.turns) + checkpoint.dumps(game)
+        self._write(_RECORD.pack(SNAPSHOT, len(payload)) + payload)
+        self._discard_size = game.deck.discard_size
+        self._reshuffles = game.deck.reshuffles
+
+    def _write(self, data):
+        self.stream.write(data)
+        self.offset += len(data)
+
+
+class ReplayReader:
+    """
+    Random access to a log written by ReplayWriter through a memory map: a turn is restored from the nearest
+    snapshot before it and at most snapshot_every - 1 turn records, without replaying the game from its start.
+    A log without an index (e.g. of a game that did not end) is indexed with one pass over its records.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.snapshot_every, rules_size = _HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError("Not a Makao replay log")
+        if version != VERSION:
+            raise ValueError(f"Unsupported replay log version: {version}")
+        self.rules = rules_from_definition(json.loads(self._map[_HEADER.size:_HEADER.size + rules_size]))
+        self._first_record = _HEADER.size + rules_size
+        self.snapshots, self.turns = self._read_index()
+        self._snapshot_turns = [turn for turn, _ in self.snapshots]
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def _read_index(self):
+        """
+        :return: Tuple (list of (turn, offset) of snapshots, number of recorded turns)
+        """
+        data = self._map
+        if len(data) >= self._first_record + _FOOTER.size:
+            index_offset, count, turns, magic = _FOOTER.unpack_from(data, len(data) - _FOOTER.size)
+            if magic == FOOTER_MAGIC:
+                start = index_offset + _RECORD.size
+                return [_INDEX_ENTRY.unpack_from(data, start + idx * _INDEX_ENTRY.size) for idx in range(count)], turns
+        # Brak indeksu: zapis przerwany w trakcie gry, liczą się tylko pełne rekordy
+        snapshots = []
+        turns = 0
+        offset = self._first_record
+        while offset + _RECORD.size <= len(data):
+            kind, size = _RECORD.unpack_from(data, offset)
+            if kind not in (SNAPSHOT, TURN) or offset + _RECORD.size + size > len(data):
+                break
+            if kind == SNAPSHOT:
+                snapshots.append((_SNAPSHOT.unpack_from(data, offset + _RECORD.size)[0], offset))
+            else:
+                turns += 1
+            offset += _RECORD.size + size
+        return snapshots, turns
+
+    def game_at(self, turn, player_types=None, log=None):
+        """
+        Restores the game as it was after a number of turns, with the turn passed to the next player
+        (turn 0 is the dealt game). The random generator is that of the nearest snapshot, so only a game
+        restored at a snapshot turn continues exactly like the recorded one.
+        :param turn: Number of turns played, from 0 to turns
+        :param player_types: Player class for every seat, Player by default
+        :param log: EventLog of the restored game, silent by default
+        :return: New MakaoGame
+        """
+        if not 0 <= turn <= self.turns:
+            raise IndexError(f"Turn {turn} is not in the log (0-{self.turns})")
+        data = self._map
+        snapshot_turn, offset = self.snapshots[bisect.bisect_right(self._snapshot_turns, turn) - 1]
+        _, size = _RECORD.unpack_from(data, offset)
+        start = offset + _RECORD.size
+        game = checkpoint.loads(data[start + _SNAPSHOT.size:start + size], player_types, log, self.rules)
+        offset = start + size
+        for _ in range(turn - snapshot_turn):
+            kind, size = _RECORD.unpack_from(data, offset)
+            offset += _RECORD.size
+            while kind != TURN:
+                offset += size
+                kind, size = _RECORD.unpack_from(data, offset)
+                offset += _RECORD.size
+            _apply_turn(game, data, offset)
+            offset += size
+        if turn and not game.is_over():
+            game.next_player()
+        return game
+
+
+def _apply_turn(game, data, offset):
+    seat, direction, flags, waiting, last_card, cards_drawn, discard_size, draw_pos, reshuffles, hand_size, \
+        cards_size = _TURN.unpack_from(data, offset)
+    offset = checkpoint.unpack_table(data, offset + _TURN.size, game.table)
+    player = game.players[seat]
+    player.hand = Hand()
+    player.hand.extend(data[offset:offset + hand_size])
+    offset += hand_size
+    checkpoint.set_player_flags(player, flags)
+    player.waiting = waiting
+    player.last_card_played = CARDS[last_card] if last_card != NONE else None
+    player.cards_drawn = cards_drawn
+    deck = game.deck
+    cards = data[offset:offset + cards_size]
+    # Po przetasowaniu zapisany jest cały bufor, w pozostałych turach tylko karty dołożone na stos
+    if reshuffles != deck.reshuffles:
+        deck.buffer[:] = cards
+    else:
+        deck.buffer[deck.discard_size:discard_size] = cards
+    deck.discard_size = discard_size
+    deck.draw_pos = draw_pos
+    deck.reshuffles = reshuffles
+    game.direction = direction
+    game.current_player_index = seat
+    game.current_player = player
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shows a turn of a recorded Makao game")
+    parser.add_argument("log", help="Replay log written by ReplayWriter, e.g. by simulation.py --replay-dir")
+    parser.add_argument("--turn", type=int, default=None, help="Number of turns played, the last turn by default")
+    args = parser.parse_args()
+
+    reader = ReplayReader(args.log)
+    turn = args.turn if args.turn is not None else reader.turns
+    game = reader.game_at(turn)
+    table = game.table
+    print(f"Turn {turn} of {reader.turns}, top card: {game.top_card()}, cards in deck: {game.deck.cards_left()}")
+    print(f"Demand: {table.demand}, change of suit: {table.change_of_suit}, to draw: {table.how_many_to_draw}, "
+          f"wait: {table.has_to_wait}")
+    for seat, player in enumerate(game.players):
+        marker = "*" if seat == game.current_player_index else " "
+        print(f"{marker} {player.name}: {player.hand}")
+    reader.close()
+
+
+if __name__ == "__main__":
+    main()
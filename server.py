@@ -0,0 +1,362 @@
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+
+from events import EventLog, TURNS
+from game import MAX_DECKS, MakaoGame, RemotePlayer, max_players
+from simulation import MAX_TURNS, STRATEGIES, game_seed, new_base_seed
+
+MOVE_TIMEOUT = 30.0
+WRITE_TIMEOUT = 10.0
+MAX_TABLES = 10000
+MAX_LINE = 64 * 1024
+# Strategie komputerów przy stołach serwera: ruch wybierany jest w pętli zdarzeń, więc przeszukiwanie (ismcts,
+# endgame) wstrzymałoby wszystkie stoły
+TABLE_STRATEGIES = ("greedy",)
+
+logger = logging.getLogger(__name__)
+
+
+class Connection:
+    """
+    One client socket. Messages are JSON objects, one per line; writes wait for the socket buffer to drain,
+    so a client which does not read slows down only its own table and is dropped after write_timeout.
+    """
+
+    def __init__(self, reader, writer, write_timeout=WRITE_TIMEOUT):
+        self.reader = reader
+        self.writer = writer
+        self.write_timeout = write_timeout
+        self.seat = None
+
+    @property
+    def closed(self):
+        return self.writer is None
+
+    def write(self, message):
+        if self.writer is not None:
+            self.writer.write(json.dumps(message, ensure_ascii=False).encode() + b"\n")
+
+    async def drain(self):
+        if self.writer is None:
+            return
+        try:
+            await asyncio.wait_for(self.writer.drain(), self.write_timeout)
+        except (asyncio.TimeoutError, ConnectionError):
+            self.close()
+
+    async def send(self, message):
+        self.write(message)
+        await self.drain()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        if self.seat is not None:
+            self.seat.leave()
+
+
+class Seat:
+    """
+    Place of a remote player at a table, the link between its Connection and RemotePlayer
+    """
+
+    def __init__(self, table, index, name, connection):
+        self.table = table
+        self.index = index
+        self.name = name
+        self.connection = connection
+        # Co najwyżej jeden ruch czeka na odebranie przez stół, None oznacza rozłączenie
+        self.moves = asyncio.Queue(maxsize=1)
+
+    def offer(self, message):
+        """
+        Passes a move message from the client to the table
+        :return: False if an earlier move is still waiting
+        """
+        try:
+            self.moves.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def leave(self):
+        self.connection = None
+        while not self.moves.empty():
+            self.moves.get_nowait()
+        self.moves.put_nowait(None)
+        self.table.seat_left()
+
+    async def send(self, message):
+        if self.connection is not None:
+            await self.connection.send(message)
+
+
+class Table:
+    """
+    One game played as a task on the server loop. Remote seats are asked for a move only when the turn leaves
+    them a choice; a seat that does not answer within move_timeout or has disconnected plays as Player would.
+    """
+
+    def __init__(self, server, table_id, remote_seats, computers, seed, decks=1):
+        self.server = server
+        self.table_id = table_id
+        self.remote_seats = remote_seats
+        self.computers = computers
+        self.seed = seed
+        self.decks = decks
+        self.seats = []
+        self.events = []
+        self.game = None
+        self.started = False
+
+    @property
+    def full(self):
+        return sum(seat.connection is not None for seat in self.seats) == self.remote_seats
+
+    def sit(self, name, connection):
+        # Miejsce klienta, który rozłączył się przed startem gry, zajmuje następny dołączający
+        index = next((seat.index for seat in self.seats if seat.connection is None), len(self.seats))
+        seat = Seat(self, index, name, connection)
+        if index < len(self.seats):
+            self.seats[index] = seat
+        else:
+            self.seats.append(seat)
+        connection.seat = seat
+        return seat
+
+    def seat_left(self):
+        """
+        Frees the seat of a client leaving a table that has not started; the table is removed from the waiting
+        tables once all its clients have disconnected
+        """
+        if self.started or any(seat.connection is not None for seat in self.seats):
+            return
+        if self.server.waiting.get(self.table_id) is self:
+            del self.server.waiting[self.table_id]
+
+    async def broadcast(self, messages):
+        connections = [seat.connection for seat in self.seats if seat.connection is not None]
+        for connection in connections:
+            for message in messages:
+                connection.write(message)
+        if connections:
+            await asyncio.gather(*(connection.drain() for connection in connections))
+
+    async def run(self, max_turns=MAX_TURNS):
+        names = [seat.name for seat in self.seats] + [f"{strategy}-{idx + 1}"
+                                                      for idx, strategy in enumerate(self.computers)]
+        player_types = [RemotePlayer] * len(self.seats) + [STRATEGIES[strategy] for strategy in self.computers]
+        self.game = game = MakaoGame(names, log=EventLog(TURNS, [self.events.append]), seed=self.seed,
+                                     player_types=player_types, decks=self.decks)
+        game.prepare_game()
+        for seat in self.seats:
+            await seat.send({"type": "start", "table": self.table_id, "seed": self.seed, "seat": seat.index,
+                             "players": names, "hand": _card_list(game.players[seat.index].hand)})
+        winner = None
+        for turn in range(1, max_turns + 1):
+            if game.current_player_index < len(self.seats):
+                await self.request_move(self.seats[game.current_player_index], turn)
+            game.play_turn()
+            await self.broadcast(self.events)
+            self.events.clear()
+            if game.is_over():
+                winner = game.current_player_index
+                break
+            game.next_player()
+            # Oddanie sterowania pętli, żeby stoły bez graczy zdalnych nie blokowały pozostałych
+            await asyncio.sleep(0)
+        await self.broadcast([{"type": "game_over", "table": self.table_id, "winner": winner, "turns": turn}])
+        for seat in self.seats:
+            if seat.connection is not None:
+                seat.connection.seat = None
+
+    async def request_move(self, seat, turn):
+        """
+        Asks a remote seat for its move and sets it on the player, if the turn leaves a choice
+        """
+        game = self.game
+        player = game.current_player
+        current_card = game.top_card()
+        playable_cards = player.decision_cards(current_card)
+        if not playable_cards or seat.connection is None:
+            return
+        while not seat.moves.empty():
+            seat.moves.get_nowait()
+        table = game.table
+        await seat.send({"type": "turn_request", "turn": turn, "top": _card_dict(current_card),
+                         "hand": _card_list(player.hand), "playable": _card_list(playable_cards),
+                         "demand": table.demand, "change_of_suit": table.change_of_suit,
+                         "to_draw": table.how_many_to_draw, "wait": table.has_to_wait,
+                         "timeout": self.server.move_timeout})
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.server.move_timeout
+        while True:
+            try:
+                message = await asyncio.wait_for(seat.moves.get(), deadline - loop.time())
+            except asyncio.TimeoutError:
+                await seat.send({"type": "timeout", "turn": turn})
+                return
+            if message is None:
+                return
+            cards = RemotePlayer.legal_move(message.get("cards"), playable_cards, player.is_response(current_card))
+            if cards is not None:
+                player.move = cards
+                return
+            await seat.send({"type": "error", "message": "Illegal move", "turn": turn})
+
+
+def _card_dict(card):
+    return {"code": card.code, "name": card.name}
+
+
+def _card_list(cards):
+    return [_card_dict(card) for card in cards]
+
+
+class GameServer:
+    """
+    Many Makao tables served from one asyncio loop over a JSON-lines protocol.
+
+    Client messages:
+    {"type": "join", "name": ..., "table": optional name of a shared table, "seats": remote seats of a new table,
+     "computers": strategy ids (TABLE_STRATEGIES) of computer seats of a new table,
+     "decks": number of decks of a new table}
+    {"type": "move", "cards": [card codes]} in answer to "turn_request"
+    Server messages have a "type" ("joined", "start", "turn_request", "timeout", "error", "game_over");
+    game events ("turn", "win", "demand", ...) are sent as EventLog emits them at the TURNS level, with an "event" key.
+    """
+
+    def __init__(self, max_tables=MAX_TABLES, move_timeout=MOVE_TIMEOUT, write_timeout=WRITE_TIMEOUT,
+                 max_turns=MAX_TURNS, base_seed=None):
+        """
+        :param max_tables: Tables played or waiting at once; further joins are refused
+        :param move_timeout: Seconds a remote seat has for a move
+        :param write_timeout: Seconds a client may keep the server waiting on a full socket before it is dropped
+        :param max_turns: Turn limit of a game
+        :param base_seed: Seed of the server, table seeds are derived from it and the table number
+        """
+        self.max_tables = max_tables
+        self.move_timeout = move_timeout
+        self.write_timeout = write_timeout
+        self.max_turns = max_turns
+        self.base_seed = base_seed if base_seed is not None else new_base_seed()
+        self.waiting = {}
+        self.tasks = set()
+        self.table_numbers = itertools.count()
+
+    @property
+    def tables(self):
+        return len(self.tasks) + len(self.waiting)
+
+    async def handle_client(self, reader, writer):
+        connection = Connection(reader, writer, self.write_timeout)
+        try:
+            while not connection.closed:
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):
+                    break
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    await connection.send({"type": "error", "message": "Invalid JSON"})
+                    continue
+                if not isinstance(message, dict):
+                    await connection.send({"type": "error", "message": "Message must be an object"})
+                elif message.get("type") == "join":
+                    await self.join(connection, message)
+                elif message.get("type") == "move":
+                    if connection.seat is None or not connection.seat.offer(message):
+                        await connection.send({"type": "error", "message": "No move expected"})
+                else:
+                    await connection.send({"type": "error", "message": "Unknown message type"})
+        finally:
+            connection.close()
+
+    async def join(self, connection, message):
+        if connection.seat is not None:
+            await connection.send({"type": "error", "message": "Already seated"})
+            return
+        name = str(message.get("name") or "remote")
+        table_name = message.get("table")
+        # Nazwa stołu i identyfikatory strategii są kluczami słowników, więc najpierw sprawdzany jest ich typ
+        if table_name is not None and not isinstance(table_name, str):
+            await connection.send({"type": "error", "message": "Invalid table"})
+            return
+        table = self.waiting.get(table_name) if table_name is not None else None
+        if table is None:
+            if self.tables >= self.max_tables:
+                await connection.send({"type": "error", "message": "Server full"})
+                return
+            remote_seats = message.get("seats", 1)
+            computers = message.get("computers", ["greedy"])
+            decks = message.get("decks", 1)
+            # Do stołu bez nazwy nikt więcej nie dosiądzie, więc może mieć tylko jedno miejsce zdalne
+            if (type(remote_seats) is not int or not isinstance(computers, list) or type(decks) is not int or
+                    not 1 <= decks <= MAX_DECKS or not 2 <= remote_seats + len(computers) <= max_players(decks) or
+                    remote_seats < 1 or (table_name is None and remote_seats > 1) or
+                    any(not isinstance(strategy, str) or strategy not in TABLE_STRATEGIES for strategy in computers)):
+                await connection.send({"type": "error", "message": "Invalid table"})
+                return
+            number = next(self.table_numbers)
+            table = Table(self, table_name if table_name is not None else f"table-{number}", remote_seats,
+                          computers, game_seed(self.base_seed, number), decks)
+            if table_name is not None:
+                self.waiting[table_name] = table
+        seat = table.sit(name, connection)
+        # Stół rusza przed pierwszym await, żeby kolejne dołączenie nie trafiło do pełnego stołu ani nie uruchomiło
+        # drugiej gry; wiadomość "start" i tak zostanie wysłana po "joined"
+        if table.full:
+            table.started = True
+            self.waiting.pop(table_name, None)
+            task = asyncio.create_task(table.run(self.max_turns))
+            self.tasks.add(task)
+            task.add_done_callback(self._table_done)
+        await connection.send({"type": "joined", "table": table.table_id, "seat": seat.index})
+
+    def _table_done(self, task):
+        self.tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Table task failed", exc_info=task.exception())
+
+    async def serve(self, host="127.0.0.1", port=8765, path=None):
+        """
+        Accepts clients until cancelled
+        :param path: Path of a Unix socket to listen on instead of host and port
+        """
+        if path is not None:
+            server = await asyncio.start_unix_server(self.handle_client, path, limit=MAX_LINE)
+        else:
+            server = await asyncio.start_server(self.handle_client, host, port, limit=MAX_LINE)
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Makao game server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="Listen on this Unix socket instead of TCP")
+    parser.add_argument("--max-tables", type=int, default=MAX_TABLES)
+    parser.add_argument("--move-timeout", type=float, default=MOVE_TIMEOUT)
+    parser.add_argument("--write-timeout", type=float, default=WRITE_TIMEOUT)
+    parser.add_argument("--max-turns", type=int, default=MAX_TURNS)
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the server")
+    args = parser.parse_args()
+
+    server = GameServer(args.max_tables, args.move_timeout, args.write_timeout, args.max_turns, args.seed)
+    print(f"Seed: {server.base_seed}")
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,391 @@
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import random
+import time
+from collections import defaultdict, namedtuple
+from contextlib import ExitStack
+from multiprocessing import Pool
+
+from analytics import GameStats
+from events import TURNS, EventLog
+from game import MAX_DECKS, Player, MakaoGame, max_players, rules_from_definition
+from ismcts import ISMCTSPlayer
+from solver import EndgamePlayer
+from metrics import Metrics
+from replay import ReplayWriter
+from strategy import Strategy, StrategyPlayer
+
+DEFAULT_NAMES = ["Jess", "Nick", "Daniel", "Anna"]
+MAX_TURNS = 2000
+
+# Strategie graczy komputerowych według identyfikatora, który wystarcza do powtórzenia gry
+STRATEGIES = {
+    "greedy": Player,
+    "ismcts": ISMCTSPlayer,
+    "endgame": EndgamePlayer,
+}
+
+
+def player_names(count):
+    """
+    :return: Names of count seats, DEFAULT_NAMES first and numbered names for larger tables
+    """
+    return DEFAULT_NAMES[:count] + [f"Player {idx + 1}" for idx in range(len(DEFAULT_NAMES), count)]
+
+
+def register_strategy(name, strategy):
+    """
+    Adds a strategy under an id usable wherever strategy ids are accepted
+    :param strategy: Player subclass or Strategy instance
+    :return: Player class of the strategy
+    """
+    player_type = StrategyPlayer.of(strategy) if isinstance(strategy, Strategy) else strategy
+    STRATEGIES[name] = player_type
+    return player_type
+
+
+def resolve_strategy(strategy):
+    """
+    Finds the player class of a strategy
+    :param strategy: Key of STRATEGIES or "module:Class" path of a Player or Strategy subclass
+    :return: Player class
+    """
+    if strategy in STRATEGIES:
+        return STRATEGIES[strategy]
+    module_name, _, class_name = strategy.partition(":")
+    if class_name:
+        try:
+            player_type = getattr(importlib.import_module(module_name), class_name)
+        except (ImportError, AttributeError):
+            player_type = None
+        if isinstance(player_type, type) and issubclass(player_type, Player):
+            return player_type
+        if isinstance(player_type, type) and issubclass(player_type, Strategy):
+            # Jedna instancja strategii na identyfikator, żeby decyzje wszystkich miejsc trafiały do niej razem
+            return register_strategy(strategy, player_type())
+    raise ValueError(f"Unknown strategy: {strategy}")
+
+# winner to numer miejsca zwycięzcy albo None, gdy gra przekroczyła limit tur
+GameResult = namedtuple("GameResult", ["game_id", "seed", "winner", "turns"])
+
+
+def game_seed(base_seed, game_id):
+    """
+    Derives the seed of one game from the seed of a whole run, so every game has its own independent stream
+    :param base_seed: Seed of the run
+    :param game_id: Number of the game within the run
+    :return: 64-bit seed of the game
+    """
+    digest = hashlib.blake2b(f"{base_seed}:{game_id}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def new_base_seed():
+    return random.SystemRandom().getrandbits(64)
+
+
+def play_game(strategies, seed=None, max_turns=MAX_TURNS, log=None, metrics=None, rules=None, decks=1, replay=None):
+    """
+    Plays one complete game between computer players without any GUI
+    :param strategies: Strategy id (see resolve_strategy) for every seat
+    :param seed: Seed of the game; the same seed and strategies always give the same game
+    :param max_turns: Turn limit after which the game is abandoned
+    :param log: EventLog receiving game events, silent by default
+    :param metrics: Metrics collecting counters and timings, disabled by default
+    :param rules: RuleSet of the game, STANDARD_RULES by default
+    :param decks: Number of combined decks
+    :param replay: ReplayWriter recording the game, None to record nothing
+    :return: Tuple (winner seat or None, number of turns played)
+    """
+    game = MakaoGame(player_names(len(strategies)), log=log, seed=seed,
+                     player_types=[resolve_strategy(strategy) for strategy in strategies], metrics=metrics,
+                     rules=rules, decks=decks)
+    game.prepare_game()
+    if replay is not None:
+        replay.start(game)
+    winner, turns = None, max_turns
+    for turn in range(1, max_turns + 1):
+        game.play_turn()
+        if replay is not None:
+            replay.record_turn(game)
+        if game.is_over():
+            winner, turns = game.current_player_index, turn
+            break
+        game.next_player()
+    if game.log.level:
+        game.log.emit("game_over", winner=winner, turns=turns)
+    if replay is not None:
+        replay.close()
+    return winner, turns
+
+
+def play_games_batched(strategies, seeds, max_turns=MAX_TURNS, metrics=None, analytics=None, rules=None,
+                       decks=1, replays=None):
+    """
+    Plays many games turn by turn side by side, so every Strategy gets the decisions of all tables waiting
+    for it in one decide_batch call. Results are the same as from play_game with the same seeds.
+    :param strategies: Strategy id for every seat
+    :param seeds: Seed of every game
+    :param analytics: GameStats to which all games are added, None to collect none
+    :param replays: ReplayWriter for every game, None to record nothing
+    :return: List of tuples (winner seat or None, number of turns played), one for every seed
+    """
+    player_types = [resolve_strategy(strategy) for strategy in strategies]
+    games = [MakaoGame(player_names(len(strategies)), seed=seed, player_types=player_types, metrics=metrics,
+                       log=_analytics_log(analytics), rules=rules, decks=decks)
+             for seed in seeds]
+    for idx, game in enumerate(games):
+        game.prepare_game()
+        if replays is not None:
+            replays[idx].start(game)
+    results = [(None, max_turns)] * len(games)
+    active = list(range(len(games)))
+    for turn in range(1, max_turns + 1):
+        requests = defaultdict(list)
+        for idx in active:
+            game = games[idx]
+            player = game.current_player
+            if isinstance(player, StrategyPlayer):
+                observation = player.observe(game.top_card())
+                if observation is not None:
+                    requests[player.strategy].append((player, observation))
+        for strategy, waiting in requests.items():
+            moves = strategy.decide_batch([observation for _, observation in waiting])
+            for (player, observation), move in zip(waiting, moves):
+                player.move = player.to_cards(observation, move)
+        still_playing = []
+        for idx in active:
+            game = games[idx]
+            game.play_turn()
+            if replays is not None:
+                replays[idx].record_turn(game)
+            if game.is_over():
+                results[idx] = game.current_player_index, turn
+            else:
+                game.next_player()
+                still_playing.append(idx)
+        active = still_playing
+        if not active:
+            break
+    for game, (winner, turns) in zip(games, results):
+        if game.log.level:
+            game.log.emit("game_over", winner=winner, turns=turns)
+    if replays is not None:
+        for replay in replays:
+            replay.close()
+    return results
+
+
+def _analytics_log(analytics):
+    return EventLog(TURNS, [analytics.sink()]) if analytics is not None else None
+
+
+def replay_game(seed, strategies, max_turns=MAX_TURNS, log=None, rules=None, decks=1):
+    """
+    Plays a game from a run again, e.g. with a verbose log to inspect it turn by turn
+    :param seed: Seed from GameResult
+    :param strategies: Strategy ids the run was played with
+    :param rules: RuleSet the run was played with
+    :param decks: Number of decks the run was played with
+    :return: Tuple (winner seat or None, number of turns played), equal to the original result
+    """
+    return play_game(strategies, seed, max_turns, log, rules=rules, decks=decks)
+
+
+def play_chunk(first_id, count, strategies, base_seed, max_turns=MAX_TURNS, rules=None, decks=1, replay_dir=None,
+               metrics=None, analytics=None):
+    """
+    Plays a chunk of consecutive games of a run in this process, e.g. in a worker of another pool
+    :param first_id: Id of the first game; game ids and base_seed give the seeds of the games
+    :param count: Number of games
+    :param strategies: Strategy id for every seat
+    :param base_seed: Seed of the run
+    :param max_turns: Turn limit of a single game
+    :param rules: RuleSet of all games, STANDARD_RULES by default
+    :param decks: Number of combined decks of every game
+    :param replay_dir: Existing directory for a replay log of every game, None to record nothing
+    :param metrics: Metrics collecting counters and timings, None to collect none
+    :param analytics: GameStats collecting statistics of the games, None to collect none
+    :return: List of GameResult
+    """
+    results = []
+    with ExitStack() as files:
+        if any(issubclass(resolve_strategy(strategy), StrategyPlayer) for strategy in strategies):
+            game_ids = range(first_id, first_id + count)
+            seeds = [game_seed(base_seed, game_id) for game_id in game_ids]
+            replays = [_replay_writer(files, replay_dir, game_id) for game_id in game_ids] if replay_dir else None
+            outcomes = play_games_batched(strategies, seeds, max_turns, metrics, analytics, rules, decks, replays)
+            for game_id, seed, (winner, turns) in zip(game_ids, seeds, outcomes):
+                results.append(GameResult(game_id, seed, winner, turns))
+            return results
+        for game_id in range(first_id, first_id + count):
+            seed = game_seed(base_seed, game_id)
+            winner, turns = play_game(strategies, seed, max_turns, _analytics_log(analytics), metrics, rules, decks,
+                                      _replay_writer(files, replay_dir, game_id))
+            results.append(GameResult(game_id, seed, winner, turns))
+            # Dziennik zakończonej gry jest zamykany od razu, żeby nie trzymać otwartych plików całej paczki
+            files.close()
+    return results
+
+
+def _play_chunk(task, metrics=None, analytics=None):
+    """
+    Worker entry point: plays a chunk of games and returns their results in one message
+    :param task: Tuple of play_chunk arguments, as made by _chunks
+    :return: List of GameResult
+    """
+    return play_chunk(*task, metrics=metrics, analytics=analytics)
+
+
+def _replay_writer(files, replay_dir, game_id):
+    """
+    Opens the replay log of a game in replay_dir
+    :param files: ExitStack closing the log file
+    :return: ReplayWriter or None if replay_dir is None
+    """
+    if replay_dir is None:
+        return None
+    return ReplayWriter(files.enter_context(open(os.path.join(replay_dir, f"{game_id}.mkr"), "wb")))
+
+
+def _play_chunk_collecting(task):
+    """
+    Worker entry point collecting metrics or analytics of the chunk
+    :param task: Tuple (task of _play_chunk, whether to collect metrics, whether to collect analytics)
+    :return: Tuple (list of GameResult, snapshot of Metrics or None, snapshot of GameStats or None)
+    """
+    chunk, with_metrics, with_analytics = task
+    metrics = Metrics() if with_metrics else None
+    analytics = GameStats(chunk[5]) if with_analytics else None
+    results = _play_chunk(chunk, metrics, analytics)
+    return (results, metrics.snapshot() if metrics is not None else None,
+            analytics.snapshot() if analytics is not None else None)
+
+
+def _chunks(games, chunk_size, strategies, base_seed, max_turns, rules, decks, replay_dir):
+    for first_id in range(0, games, chunk_size):
+        yield first_id, min(chunk_size, games - first_id), strategies, base_seed, max_turns, rules, decks, replay_dir
+
+
+def iter_results(games, strategies=("greedy", "greedy"), base_seed=None, processes=None, chunk_size=500,
+                 max_turns=MAX_TURNS, metrics=None, analytics=None, rules=None, decks=1, replay_dir=None):
+    """
+    Plays games on a process pool and yields their results as soon as chunks are finished
+    :param games: Number of games to play
+    :param strategies: Strategy id for every seat, from 2 seats up to max_players(decks)
+    :param base_seed: Seed of the run, every game gets a seed derived from it and its id
+    :param processes: Number of worker processes, defaults to the number of cores
+    :param chunk_size: Number of games sent to a worker at once
+    :param max_turns: Turn limit of a single game
+    :param metrics: Metrics to which counters and timings of all workers are added, None to collect none
+    :param analytics: GameStats to which statistics of all games are added, None to collect none
+    :param rules: RuleSet of all games, STANDARD_RULES by default
+    :param decks: Number of combined decks of every game, from 1 up to MAX_DECKS
+    :param replay_dir: Existing directory to which a replay log of every game is written as <game id>.mkr,
+                       None to record nothing
+    :return: Generator of GameResult, in completion order
+    """
+    if not 1 <= decks <= MAX_DECKS:
+        raise ValueError(f"Number of decks must be between 1 and {MAX_DECKS}")
+    if not 2 <= len(strategies) <= max_players(decks):
+        raise ValueError(f"Number of players must be between 2 and {max_players(decks)}")
+    for strategy in strategies:
+        resolve_strategy(strategy)
+    if base_seed is None:
+        base_seed = new_base_seed()
+    tasks = _chunks(games, chunk_size, tuple(strategies), base_seed, max_turns, rules, decks, replay_dir)
+    if metrics is not None or analytics is not None:
+        if processes == 1:
+            for task in tasks:
+                yield from _play_chunk(task, metrics, analytics)
+            return
+        tasks = ((task, metrics is not None, analytics is not None) for task in tasks)
+        with Pool(processes) as pool:
+            for results, metrics_snapshot, analytics_snapshot in pool.imap_unordered(_play_chunk_collecting, tasks):
+                if metrics is not None:
+                    metrics.merge(metrics_snapshot)
+                if analytics is not None:
+                    analytics.merge(analytics_snapshot)
+                yield from results
+        return
+    if processes == 1:
+        for task in tasks:
+            yield from _play_chunk(task)
+        return
+    with Pool(processes) as pool:
+        for results in pool.imap_unordered(_play_chunk, tasks):
+            yield from results
+
+
+def simulate(games, strategies=("greedy", "greedy"), base_seed=None, processes=None, chunk_size=500,
+             max_turns=MAX_TURNS, rules=None, decks=1):
+    """
+    Plays games on a process pool and returns all results
+    :return: List of GameResult sorted by game id
+    """
+    results = list(iter_results(games, strategies, base_seed, processes, chunk_size, max_turns, rules=rules,
+                                decks=decks))
+    results.sort(key=lambda result: result.game_id)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless Makao simulation")
+    parser.add_argument("--games", type=int, default=10000)
+    parser.add_argument("--players", type=int, default=2)
+    parser.add_argument("--strategies", default=None,
+                        help="Comma separated strategy ids, one per seat (overrides --players)")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the run")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--max-turns", type=int, default=MAX_TURNS)
+    parser.add_argument("--metrics", help="Collect counters and timings and write them to this file "
+                                          "(Prometheus text format for .prom, JSON otherwise)")
+    parser.add_argument("--analytics", help="Collect statistics of all games, print them and write them "
+                                            "as JSON to this file")
+    parser.add_argument("--rules", help="JSON file with a rule variant, keyword arguments of game.RuleSet")
+    parser.add_argument("--decks", type=int, default=1, choices=range(1, MAX_DECKS + 1),
+                        help="Number of combined 52-card decks")
+    parser.add_argument("--replay-dir", help="Write a replay log of every game to this directory (see replay.py)")
+    args = parser.parse_args()
+
+    strategies = args.strategies.split(",") if args.strategies else ["greedy"] * args.players
+    base_seed = args.seed if args.seed is not None else new_base_seed()
+    start = time.perf_counter()
+    wins = [0] * len(strategies)
+    unfinished = 0
+    turns = 0
+    metrics = Metrics() if args.metrics else None
+    if args.replay_dir:
+        os.makedirs(args.replay_dir, exist_ok=True)
+    rules = None
+    if args.rules:
+        with open(args.rules) as file:
+            rules = rules_from_definition(json.load(file))
+    analytics = GameStats(rules) if args.analytics else None
+    for result in iter_results(args.games, strategies, base_seed, args.processes, args.chunk_size,
+                               args.max_turns, metrics, analytics, rules, args.decks, args.replay_dir):
+        if result.winner is None:
+            unfinished += 1
+        else:
+            wins[result.winner] += 1
+        turns += result.turns
+    elapsed = time.perf_counter() - start
+
+    print(f"Seed: {base_seed}")
+    print(f"Games: {args.games}, time: {elapsed:.2f}s, games/s: {args.games / elapsed:.0f}, "
+          f"turns/s: {turns / elapsed:.0f}")
+    print(f"Wins by seat: {wins}, unfinished: {unfinished}")
+    if metrics is not None:
+        metrics.dump(args.metrics)
+    if analytics is not None:
+        print(analytics.report())
+        with open(args.analytics, "w") as file:
+            file.write(analytics.to_json())
+
+
+if __name__ == "__main__":
+    main()
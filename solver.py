@@ -0,0 +1,166 @@
+import random
+import time
+
+from game import CARDS, RemotePlayer, candidate_moves
+
+# Solver włącza się, gdy każdy gracz ma co najwyżej tyle kart
+ENDGAME_CARDS = 4
+TABLE_SIZE = 50000
+TIME_LIMIT = 0.05
+MAX_DEPTH = 60
+
+
+class _Timeout(Exception):
+    pass
+
+
+def _copy_rng(rng):
+    copy = random.Random()
+    copy.setstate(rng.getstate())
+    return copy
+
+
+class EndgameSolver:
+    """
+    Exact search of the game tree with full knowledge of hands and of the deck order, as in a simulation.
+    Moves are those of game.candidate_moves and everything else follows the rules of Player.logic; a reshuffle
+    uses a copy of the game's random generator, so it happens exactly as it would in the game.
+
+    Every seat plays for its own win; a seat that cannot win keeps to the first of its moves. Results are
+    proven, never estimated: a position not decided within the depth or time limits has no result.
+    Proven positions are kept in a transposition table shared by all searches of the solver; when it is full,
+    the oldest entries are dropped.
+    """
+
+    def __init__(self, table_size=TABLE_SIZE, time_limit=TIME_LIMIT, max_depth=MAX_DEPTH):
+        """
+        :param table_size: Maximum number of positions in the transposition table
+        :param time_limit: Time budget of one search in seconds, None for no limit
+        :param max_depth: Maximum number of turns searched ahead
+        """
+        self.table_size = table_size
+        self.time_limit = time_limit
+        self.max_depth = max_depth
+        self.table = {}
+        self.nodes = 0
+        self._deadline = None
+        self._reshuffles = 0
+        self._rng_state = None
+
+    def best_move(self, game):
+        """
+        Solves the position at the start of the current player's turn
+        :param game: MakaoGame, not changed by the search
+        :return: Tuple (move as a tuple of card codes, winner seat with best play) or None if the position
+                 was not solved within the limits or the current player has no choice
+        """
+        root = game.clone(player_types=[RemotePlayer] * len(game.players), rng=_copy_rng(game.rng))
+        self._deadline = time.monotonic() + self.time_limit if self.time_limit is not None else None
+        self._reshuffles = root.deck.reshuffles
+        self._rng_state = hash(root.rng.getstate())
+        try:
+            winner, move = self._search(root, 0)
+        except _Timeout:
+            return None
+        if winner is None or move is None:
+            return None
+        return move, winner
+
+    def _key(self, game):
+        deck = game.deck
+        table = game.table
+        # Luka bufora między stosem a talią to stare kody kart trzymanych przez graczy, nie wchodzi do klucza
+        key = [game.current_player_index, game.direction, deck.discard_size, deck.draw_pos,
+               bytes(deck.buffer[:deck.discard_size]), bytes(deck.buffer[deck.draw_pos:]), table.demand,
+               table.change_of_suit, table.has_to_draw, table.has_to_wait, table.drawn_countJ,
+               table.how_many_to_draw, table.how_much_to_wait]
+        for player in game.players:
+            # Kolejność kart w ręce ma znaczenie: as zmienia kolor na kolor ostatniej karty
+            key.append(bytes(player.hand.codes))
+            key.append(player.waiting)
+        # Kolejne tasowania zależą od stanu generatora, który zmienia się tylko przy tasowaniu
+        key.append(hash(game.rng.getstate()) if deck.reshuffles != self._reshuffles else self._rng_state)
+        return tuple(key)
+
+    def _store(self, key, result):
+        table = self.table
+        if len(table) >= self.table_size:
+            del table[next(iter(table))]
+        table[key] = result
+
+    def _search(self, game, depth):
+        """
+        :param game: Position at the start of a turn, owned by the search and changed by it
+        :return: Tuple (winner seat or None if not proven, best move or None)
+        """
+        key = self._key(game)
+        result = self.table.get(key)
+        if result is not None:
+            return result
+        self.nodes += 1
+        if self._deadline is not None and not self.nodes & 15 and time.monotonic() > self._deadline:
+            raise _Timeout
+        if depth >= self.max_depth:
+            return None, None
+
+        seat = game.current_player_index
+        player = game.current_player
+        top = game.top_card()
+        playable_cards = player.show_playable_cards(top) if not player.waiting else None
+        moves = candidate_moves(playable_cards, player.is_response(top)) if playable_cards else (None,)
+        proven = True
+        result = None
+        for idx, move in enumerate(moves):
+            child = game if idx == len(moves) - 1 else game.clone(rng=_copy_rng(game.rng))
+            if move is not None:
+                child.current_player.move = [CARDS[code] for code in move]
+            child.play_turn()
+            if child.is_over():
+                winner = child.current_player_index
+            else:
+                child.next_player()
+                winner, _ = self._search(child, depth + 1)
+            if winner is None:
+                proven = False
+            elif winner == seat:
+                result = seat, move
+                break
+            elif result is None:
+                result = winner, move
+        else:
+            if not proven:
+                return None, None
+        self._store(key, result)
+        return result
+
+
+class EndgamePlayer(RemotePlayer):
+    """
+    Computer player who plays like Player until every hand has at most ENDGAME_CARDS cards, and then plays
+    the move proven best by EndgameSolver whenever the search finishes within its time limit. Once a position
+    is solved, the player follows the solution even when hands grow again; positions on it are already in the
+    transposition table. The solver sees all hands and the deck, so the player is meant for simulations.
+    """
+
+    def __init__(self, name, player_id=1, table=None, time_limit=TIME_LIMIT, table_size=TABLE_SIZE):
+        super().__init__(name, player_id, table)
+        self.solver = EndgameSolver(table_size, time_limit)
+        self.solved = False
+
+    def copy(self, table, player_type=None):
+        player = super().copy(table, player_type)
+        if isinstance(player, EndgamePlayer):
+            player.solver = self.solver
+            player.solved = self.solved
+        return player
+
+    def logic(self, deck, current_card):
+        game = self.game
+        if (self.move is None and game is not None and
+                (self.solved or all(len(player.hand) <= ENDGAME_CARDS for player in game.players)) and
+                self.observe(current_card) is not None):
+            solved = self.solver.best_move(game)
+            self.solved = solved is not None
+            if solved is not None:
+                self.move = [CARDS[code] for code in solved[0]]
+        return super().logic(deck, current_card)
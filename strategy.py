@@ -0,0 +1,82 @@
+from game import CARDS, RANK_OF, RemotePlayer
+
+
+class Strategy:
+    """
+    Decision policy of a computer player, kept apart from the rules: the game enforces penalties, blocks and
+    draws, and asks the strategy only when the turn leaves a choice. A strategy gets a read-only Observation
+    with the legal moves already listed and returns one of them.
+
+    Evaluators that are cheaper per position in bulk (e.g. a learned value function) override decide_batch;
+    simulation.play_games_batched then collects the decisions of many tables into one call.
+    """
+
+    def decide(self, observation):
+        """
+        :param observation: Observation of the coming decision
+        :return: One of observation.moves
+        """
+        return self.decide_batch([observation])[0]
+
+    def decide_batch(self, observations):
+        """
+        :param observations: Observations of decisions at different tables
+        :return: List of moves, one for every observation
+        """
+        if type(self).decide is Strategy.decide:
+            raise NotImplementedError(f"{type(self).__name__} must override decide or decide_batch")
+        return [self.decide(observation) for observation in observations]
+
+
+class GreedyStrategy(Strategy):
+    """
+    The choice of Player: the first card in answer to a pending effect, otherwise all cards of the most common
+    playable rank
+    """
+
+    def decide(self, observation):
+        moves = observation.moves
+        best = moves[0]
+        if observation.response:
+            return best
+        # Ruchy tej samej rangi są kolejno; Player kończy kartą ostatnią w ręce
+        for move in moves:
+            if len(move) > len(best) or len(move) == len(best) and RANK_OF[move[-1]] == RANK_OF[best[-1]]:
+                best = move
+        return best
+
+
+class StrategyPlayer(RemotePlayer):
+    """
+    Player whose choices are made by a Strategy. A move set beforehand (see simulation.play_games_batched)
+    is used as it is; otherwise the strategy is asked for a single decision at the start of the turn.
+    """
+    strategy = GreedyStrategy()
+
+    @classmethod
+    def of(cls, strategy):
+        """
+        Creates a player class bound to a strategy, to be used in player_types of MakaoGame
+        :param strategy: Strategy instance shared by all players of the class
+        :return: Subclass of StrategyPlayer
+        """
+        return type(f"{type(strategy).__name__}Player", (cls,), {"strategy": strategy})
+
+    @staticmethod
+    def to_cards(observation, move):
+        """
+        Checks a move returned by a strategy
+        :return: List of cards to play
+        """
+        move = tuple(move)
+        if move not in observation.moves:
+            raise ValueError(f"Strategy returned an illegal move: {move}")
+        return [CARDS[code] for code in move]
+
+    def logic(self, deck, current_card):
+        # Obserwacja sprzed tury, tak samo jak przy decyzjach zbieranych z wielu stołów naraz
+        if self.move is None:
+            observation = self.observe(current_card)
+            if observation is not None:
+                self.move = self.to_cards(observation, self.strategy.decide(observation))
+        return super().logic(deck, current_card)
@@ -0,0 +1,268 @@
+import argparse
+import itertools
+import json
+import math
+import os
+import time
+from collections import defaultdict
+from multiprocessing import Pool
+
+from simulation import MAX_TURNS, game_seed, new_base_seed, play_chunk, resolve_strategy
+
+ELO_BASE = 1500
+# Kwantyl rozkładu normalnego dla 95% przedziału ufności
+Z_95 = 1.96
+
+
+def matchups(strategies, sizes=(2, 3, 4)):
+    """
+    Lists every seat order of the strategies at every table size, leaving out tables of a single strategy
+    :return: Generator of tuples of strategy ids, one per seat
+    """
+    for size in sizes:
+        for seats in itertools.product(strategies, repeat=size):
+            if len(set(seats)) > 1:
+                yield seats
+
+
+def matchup_seed(base_seed, seats):
+    return game_seed(base_seed, ",".join(seats))
+
+
+def wilson_interval(wins, games, z=Z_95):
+    """
+    Wilson score interval of a win rate
+    :return: Tuple (lower bound, upper bound)
+    """
+    if not games:
+        return 0.0, 1.0
+    rate = wins / games
+    denominator = 1 + z * z / games
+    centre = (rate + z * z / (2 * games)) / denominator
+    half = z * math.sqrt(rate * (1 - rate) / games + z * z / (4 * games * games)) / denominator
+    return max(0.0, centre - half), min(1.0, centre + half)
+
+
+def elo_ratings(pair_wins, strategies, iterations=200):
+    """
+    Fits Bradley-Terry strengths to pairwise results (the winner of a game beats every seat of another strategy)
+    and puts them on the Elo scale, so the result does not depend on the order in which games finished
+    :param pair_wins: pair_wins[a][b] is the number of times strategy a beat strategy b
+    :return: Dictionary of ratings averaging ELO_BASE
+    """
+    strength = {strategy: 1.0 for strategy in strategies}
+    for _ in range(iterations):
+        updated = {}
+        for a in strategies:
+            # Pół wygranej w każdą stronę dla każdej pary chroni przed zerową siłą strategii bez zwycięstw
+            wins = sum(pair_wins[a][b] + 0.5 for b in strategies if b != a)
+            games = sum((pair_wins[a][b] + pair_wins[b][a] + 1) / (strength[a] + strength[b])
+                        for b in strategies if b != a)
+            updated[a] = wins / games
+        scale = math.exp(sum(math.log(value) for value in updated.values()) / len(updated))
+        strength = {strategy: value / scale for strategy, value in updated.items()}
+    return {strategy: ELO_BASE + 400 * math.log10(value) for strategy, value in strength.items()}
+
+
+class TournamentStats:
+    """
+    Statistics updated with every finished game: wins and seats of every strategy in total and by table size,
+    and pairwise wins for ratings
+    """
+
+    def __init__(self, strategies):
+        self.strategies = list(strategies)
+        self.games = 0
+        self.unfinished = 0
+        self.turns = 0
+        self.seats = defaultdict(int)
+        self.wins = defaultdict(int)
+        self.expected = defaultdict(float)
+        self.pair_wins = {a: {b: 0 for b in self.strategies} for a in self.strategies}
+
+    def add(self, record):
+        seats = record["seats"]
+        self.games += 1
+        self.turns += record["turns"]
+        for strategy in seats:
+            self.seats[strategy, len(seats)] += 1
+        winner = record["winner"]
+        if winner is None:
+            self.unfinished += 1
+            return
+        for strategy in seats:
+            self.expected[strategy, len(seats)] += 1 / len(seats)
+        winning = seats[winner]
+        self.wins[winning, len(seats)] += 1
+        for strategy in seats:
+            if strategy != winning:
+                self.pair_wins[winning][strategy] += 1
+
+    def rows(self):
+        """
+        :return: List of (strategy, table size or None for all sizes, seats, wins, win rate, lower, upper,
+                 rate expected from luck alone)
+        """
+        rows = []
+        sizes = sorted({size for _, size in self.seats})
+        for strategy in self.strategies:
+            for size in [*sizes, None]:
+                keys = [(strategy, size)] if size is not None else [(strategy, other) for other in sizes]
+                seats = sum(self.seats[key] for key in keys)
+                if not seats:
+                    continue
+                wins = sum(self.wins[key] for key in keys)
+                lower, upper = wilson_interval(wins, seats)
+                rows.append((strategy, size, seats, wins, wins / seats, lower, upper,
+                             sum(self.expected[key] for key in keys) / seats))
+        return rows
+
+    def report(self):
+        lines = [f"Games: {self.games}, unfinished: {self.unfinished}, "
+                 f"turns per game: {self.turns / self.games if self.games else 0:.1f}",
+                 f"{'strategy':16} {'size':>4} {'seats':>8} {'wins':>8} {'rate':>7} {'95% CI':>15} {'luck':>6}"]
+        for strategy, size, seats, wins, rate, lower, upper, expected in self.rows():
+            lines.append(f"{strategy:16} {size or 'all':>4} {seats:8} {wins:8} {rate:7.3f} "
+                         f"[{lower:.3f}, {upper:.3f}] {expected:6.3f}")
+        lines.append("")
+        ratings = elo_ratings(self.pair_wins, self.strategies)
+        for strategy in sorted(ratings, key=ratings.get, reverse=True):
+            lines.append(f"{strategy:16} Elo {ratings[strategy]:7.1f}")
+        return "\n".join(lines)
+
+
+def load_results(path, config):
+    """
+    Reads results written by an earlier run of the same tournament, dropping a line cut off by an interruption
+    :param config: Settings of this run, which must match the settings stored in the file
+    :return: List of result records
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path, "rb+") as file:
+        data = file.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            file.truncate(end)
+    lines = data[:end].decode().splitlines()
+    if not lines:
+        return []
+    stored = json.loads(lines[0]).get("tournament")
+    if stored != config:
+        raise ValueError(f"{path} holds results of a different tournament: {stored}")
+    return [json.loads(line) for line in lines[1:]]
+
+
+def _runs(game_ids):
+    """
+    Groups sorted game ids into runs of consecutive ids
+    :return: Generator of (first id, count)
+    """
+    for _, run in itertools.groupby(enumerate(game_ids), lambda item: item[1] - item[0]):
+        run = [game_id for _, game_id in run]
+        yield run[0], len(run)
+
+
+def _tasks(config, done, chunk_size):
+    for seats in matchups(config["strategies"], config["sizes"]):
+        played = done.get(seats, ())
+        missing = [game_id for game_id in range(config["games"]) if game_id not in played]
+        for first_id, count in _runs(missing):
+            for start in range(first_id, first_id + count, chunk_size):
+                yield (start, min(chunk_size, first_id + count - start), seats,
+                       matchup_seed(config["seed"], seats), config["max_turns"])
+
+
+def _play_task(task):
+    first_id, count, seats, seed, max_turns = task
+    return seats, play_chunk(first_id, count, seats, seed, max_turns)
+
+
+def run_tournament(path, strategies, games=100, sizes=(2, 3, 4), base_seed=None, processes=None, chunk_size=50,
+                   max_turns=MAX_TURNS, progress=None):
+    """
+    Plays every matchup of the strategies on a process pool, appending results to a JSON-lines file as soon as
+    chunks finish. Running it again with the same file plays only the games that are missing.
+    :param path: Results file; its first line holds the settings of the tournament
+    :param strategies: Strategy ids (see simulation.resolve_strategy)
+    :param games: Games of every matchup
+    :param sizes: Table sizes
+    :param base_seed: Seed of the tournament, taken from the file when resuming
+    :param processes: Number of worker processes, 1 to play in this process
+    :param chunk_size: Games sent to a worker at once
+    :param max_turns: Turn limit of a single game
+    :param progress: Callable receiving TournamentStats after every chunk
+    :return: TournamentStats of all games, including those from earlier runs
+    """
+    for strategy in strategies:
+        resolve_strategy(strategy)
+    if base_seed is None and os.path.exists(path):
+        with open(path) as file:
+            first_line = file.readline()
+        if first_line.endswith("\n"):
+            base_seed = json.loads(first_line)["tournament"]["seed"]
+    config = {"strategies": list(strategies), "games": games, "sizes": list(sizes),
+              "seed": base_seed if base_seed is not None else new_base_seed(), "max_turns": max_turns}
+
+    stats = TournamentStats(strategies)
+    done = defaultdict(set)
+    records = load_results(path, config)
+    for record in records:
+        stats.add(record)
+        done[tuple(record["seats"])].add(record["game_id"])
+
+    tasks = _tasks(config, done, chunk_size)
+    with open(path, "a") as file:
+        if not records and file.tell() == 0:
+            file.write(json.dumps({"tournament": config}) + "\n")
+        if processes == 1:
+            chunks = map(_play_task, tasks)
+            pool = None
+        else:
+            pool = Pool(processes)
+            chunks = pool.imap_unordered(_play_task, tasks)
+        try:
+            for seats, results in chunks:
+                for result in results:
+                    record = {"seats": list(seats), **result._asdict()}
+                    file.write(json.dumps(record) + "\n")
+                    stats.add(record)
+                file.flush()
+                if progress is not None:
+                    progress(stats)
+        finally:
+            if pool is not None:
+                pool.terminate()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Round-robin tournament of Makao strategies")
+    parser.add_argument("--strategies", default="greedy,ismcts",
+                        help="Comma separated strategy ids or module:Class paths")
+    parser.add_argument("--games", type=int, default=100, help="Games of every seat order")
+    parser.add_argument("--sizes", default="2,3,4", help="Comma separated table sizes")
+    parser.add_argument("--output", default="tournament.jsonl", help="Results file, resumed if it exists")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=50)
+    parser.add_argument("--max-turns", type=int, default=MAX_TURNS)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    last = [start]
+
+    def progress(stats):
+        now = time.perf_counter()
+        if now - last[0] >= 5:
+            last[0] = now
+            print(f"{stats.games} games, {now - start:.0f}s", flush=True)
+
+    stats = run_tournament(args.output, args.strategies.split(","), args.games,
+                           [int(size) for size in args.sizes.split(",")], args.seed, args.processes,
+                           args.chunk_size, args.max_turns, progress)
+    print(stats.report())
+
+
+if __name__ == "__main__":
+    main()